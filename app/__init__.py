@@ -1,7 +1,113 @@
-from flask import Flask
-from flask_cors import CORS
+"""Social Media Insights API.
+
+`create_app` builds the Flask app; `flask_app.app` is the instance gunicorn
+serves. Importing this package stays cheap (the FastAPI service imports
+app.* too): everything the Flask app needs is imported inside the factory,
+and the platform wrappers load on first use unless `warm()` pulls them in
+early.
+"""
+import os
+import time
+
+
+def create_app(config: dict = None):
+    from dotenv import load_dotenv
+    # Before the app modules below read their settings from the environment
+    load_dotenv()
+
+    from flask import Flask, Response, g, jsonify, request
+    from flask_cors import CORS
+    from app.auth import auth_bp
+    from app.routes.insights import insights_bp
+    from app.utils import metrics, timing
+    from app.utils.profiler import profiler
+    from app.utils.ratelimit import limiter
 
-def create_app():
     app = Flask(__name__)
+    app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', 'change-me')
+    if config:
+        app.config.update(config)
+
     CORS(app)
+
+    # Registered before the limiter's own hook so its check is timed and profiled too
+    @app.before_request
+    def start_profiling():
+        g.timing_token = timing.start()
+        g.profiled = profiler.begin(request.url_rule.rule if request.url_rule else 'unmatched')
+
+    @app.teardown_request
+    def stop_profiling(exc):
+        if g.pop('profiled', False):
+            profiler.end()
+
+    limiter.init_app(app)
+
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(insights_bp, url_prefix='/api')
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+        metrics.request_started('flask')
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            metrics.request_finished('flask', route, request.method, response.status_code, time.perf_counter() - started)
+        server_timing = timing.finish(g.pop('timing_token', None))
+        if server_timing:
+            response.headers['Server-Timing'] = server_timing
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    @limiter.exempt
+    def prometheus_metrics():
+        body, content_type = metrics.render()
+        return Response(body, content_type=content_type)
+
+    @app.route('/', methods=['GET'])
+    def home():
+        return jsonify({
+            'message': 'Social Media Insights API Wrapper',
+            'endpoints': {
+                'auth': '/api/auth/login',
+                'reddit': '/api/insights/reddit',
+                'reddit_stream': '/api/insights/reddit/stream',
+                'youtube': '/api/insights/youtube',
+                'batch': '/api/insights/batch',
+                'trending': '/api/trending'
+            }
+        })
+
+    @app.errorhandler(429)
+    def ratelimit_handler(e):
+        metrics.rate_limited('flask', request.url_rule.rule if request.url_rule else 'unmatched')
+        return jsonify({'error': 'Rate limit exceeded'}), 429
+
+    @app.errorhandler(500)
+    def server_error(e):
+        return jsonify({'error': 'Internal server error'}), 500
+
     return app
+
+
+def warm():
+    """Import what the workers would otherwise load lazily on first request.
+    Run in a pre-forking parent (gunicorn --preload) so the code is shared
+    copy-on-write instead of loaded again in every worker."""
+    from app import wrappers
+    from app.utils import analytics
+    wrappers.load_all()
+    analytics.available()
+
+
+def after_fork():
+    """Per-worker setup after a pre-forking parent: anything holding sockets,
+    threads or locks is rebuilt in the child. (The rate-limit table, snapshot
+    store and refresh scheduler already re-open per pid, and redis-py resets
+    its pool itself.)"""
+    from app.utils import http_pool
+    http_pool.after_fork()
@@ -1,13 +1,23 @@
 from flask import Blueprint, request, jsonify
 import jwt
+import time
+import hashlib
 import datetime
 import os
+import threading
 from functools import wraps
+from app.utils import cache, timing
+from app.utils.cache import LRUCache
 
 auth_bp = Blueprint('auth', __name__)
 
 SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'supersecretkey')
 JWT_EXPIRATION = int(os.getenv('JWT_EXPIRATION_HOURS', 2))
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+# A cached token is trusted this long at most before the revocation checks
+# run again; it bounds how late another worker notices a revocation
+TOKEN_CACHE_MAX_TTL = float(os.getenv('TOKEN_CACHE_MAX_TTL', 300))
+ADMIN_USERS = frozenset(name.strip() for name in os.getenv('ADMIN_USERS', 'admin').split(',') if name.strip())
 
 USERS = {
     'admin': 'admin123',
@@ -37,18 +47,147 @@ def login():
         'expires_in': JWT_EXPIRATION * 3600
     }), 200
 
+class TokenCache:
+    """Verified token claims by token digest, shared by every auth path in
+    the process (token_required, the rate limiter's key function, the
+    FastAPI service), so a token is HMAC-checked and parsed once rather than
+    on every request. Entries expire at the token's `exp`.
+
+    Revocation: `revoke` denies a token here and, with Redis configured, in
+    every worker; `add_revocation_check` registers extra checks (e.g. a
+    disabled-user lookup) called with the claims whenever a token is
+    verified afresh.
+    """
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_SIZE, max_ttl: float = TOKEN_CACHE_MAX_TTL):
+        self.max_ttl = max_ttl
+        self._verified = LRUCache(max_entries)
+        self._revoked = LRUCache(max_entries)
+        self._checks = []
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'rejected_revoked': 0, 'revocations': 0}
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    @staticmethod
+    def _shared_key(key: str) -> str:
+        return f"{cache.KEY_PREFIX}:auth:revoked:{key}"
+
+    def _is_revoked(self, key: str, claims: dict) -> bool:
+        # Plain Redis reads: the entity stores would count these as channel cache traffic
+        if self._revoked.get(key) is not None or cache.get(self._shared_key(key)) is not None:
+            return True
+        return any(check(claims) for check in self._checks)
+
+    def verify(self, token: str) -> dict:
+        """Claims of a valid, unrevoked token. Raises jwt.InvalidTokenError."""
+        key = self.digest(token)
+        claims = self._verified.get(key)
+        if claims is not None:
+            self._count('hits')
+            return claims
+        self._count('misses')
+        claims = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+        if self._is_revoked(key, claims):
+            self._count('rejected_revoked')
+            raise jwt.InvalidTokenError('Token revoked')
+        ttl = min(_remaining(claims, self.max_ttl), self.max_ttl)
+        if ttl > 0:
+            self._verified.set(key, claims, ttl)
+        return claims
+
+    async def verify_async(self, token: str) -> dict:
+        """`verify` for coroutines: a cached token is answered inline, a fresh
+        one off the event loop, since its revocation lookup may be a Redis
+        round trip."""
+        claims = self._verified.get(self.digest(token))
+        if claims is not None:
+            self._count('hits')
+            return claims
+        return await cache.offload(self.verify, token)
+
+    def revoke(self, token: str) -> bool:
+        """Deny `token` until it expires. False when it is not a valid token
+        (already expired or forged), which needs no revoking."""
+        try:
+            claims = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+        except jwt.InvalidTokenError:
+            return False
+        key = self.digest(token)
+        ttl = _remaining(claims, JWT_EXPIRATION * 3600)
+        self._revoked.set(key, True, ttl)
+        cache.set(self._shared_key(key), True, ex=max(int(ttl), 1))
+        self._verified.delete(key)
+        self._count('revocations')
+        return True
+
+    def add_revocation_check(self, check):
+        """`check(claims) -> bool`; True rejects the token."""
+        self._checks.append(check)
+
+    def clear(self):
+        self._verified.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, cached=len(self._verified), max_ttl=self.max_ttl)
+
+
+def _remaining(claims: dict, default: float) -> float:
+    exp = claims.get('exp')
+    return default if exp is None else float(exp) - time.time()
+
+
+tokens = TokenCache()
+
+def decode_token(token: str):
+    """Verify a bearer token and return its user. Raises jwt.InvalidTokenError."""
+    return tokens.verify(token).get('user')
+
+async def decode_token_async(token: str):
+    """decode_token for the async service."""
+    return (await tokens.verify_async(token)).get('user')
+
+def bearer_token() -> str:
+    return request.headers.get('Authorization', '').replace('Bearer ', '')
+
+@auth_bp.route('/logout', methods=['POST'])
+def logout():
+    token = bearer_token()
+    if not token:
+        return jsonify({'error': 'Token missing'}), 401
+    if not tokens.revoke(token):
+        return jsonify({'error': 'Invalid token'}), 401
+    return jsonify({'message': 'Logged out'}), 200
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
+        token = bearer_token()
         if not token:
             return jsonify({'error': 'Token missing'}), 401
         try:
-            data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            current_user = data.get('user')
+            with timing.phase('auth'):
+                current_user = decode_token(token)
         except jwt.ExpiredSignatureError:
             return jsonify({'error': 'Token expired'}), 401
         except jwt.InvalidTokenError:
             return jsonify({'error': 'Invalid token'}), 401
         return f(current_user, *args, **kwargs)
     return decorated
+
+def admin_required(f):
+    """token_required, and the user must be listed in ADMIN_USERS."""
+    @wraps(f)
+    @token_required
+    def decorated(current_user, *args, **kwargs):
+        if current_user not in ADMIN_USERS:
+            return jsonify({'error': 'Admin access required'}), 403
+        return f(current_user, *args, **kwargs)
+    return decorated
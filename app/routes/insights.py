@@ -1,16 +1,38 @@
-from flask import Blueprint, request, jsonify
-from app.auth import token_required
+import os
+import math
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from app.auth import admin_required, token_required, tokens
 from app.security import Validator
-from app.wrappers import RedditWrapper, YouTubeWrapper, LinkedInWrapper
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
+from app.utils import analytics, cache, http_pool, quota, resilience, responses, snapshots
+from app.utils.profiler import profiler
+from app.utils.ratelimit import limit
+from app import wrappers
+from app.wrappers import fields as fieldsets
 
 insights_bp = Blueprint('insights', __name__)
-limiter = Limiter(key_func=get_remote_address)
+
+STREAM_MAX_POSTS = int(os.getenv('STREAM_MAX_POSTS', 10000))
+BATCH_MAX_TARGETS = int(os.getenv('BATCH_MAX_TARGETS', 100))
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', 8))
+HISTORY_MAX_HOURS = int(os.getenv('HISTORY_MAX_HOURS', 24 * 30))
+ANALYTICS_MAX_SUBREDDITS = int(os.getenv('ANALYTICS_MAX_SUBREDDITS', 20))
+ANALYTICS_MAX_POSTS = int(os.getenv('ANALYTICS_MAX_POSTS', 1000))  # per subreddit
+# Shared across requests so concurrent batches cannot multiply upstream fan-out
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix='batch')
+
+def _fields_arg(allowed=None):
+    """Parse `fields=` into (fields, error_response); fields is None when absent."""
+    try:
+        return fieldsets.parse(request.args.get('fields'), allowed), None
+    except ValueError as e:
+        return None, (jsonify({'error': str(e)}), 400)
 
 @insights_bp.route('/insights/reddit', methods=['GET'])
 @token_required
-@limiter.limit("10/minute")
+@limit('insights')
 def reddit_insights(current_user):
     subreddit = request.args.get('subreddit', 'technology')
     limit = request.args.get('limit', 10, type=int)
@@ -21,22 +43,76 @@ def reddit_insights(current_user):
     if limit < 1 or limit > 100:
         limit = 10
 
-    data = RedditWrapper.get_subreddit_posts(subreddit, limit)
-    return jsonify(data), 200
+    fields, error = _fields_arg(wrappers.RedditWrapper.POST_FIELDS)
+    if error:
+        return error
+    data = wrappers.RedditWrapper.get_subreddit_posts(subreddit, limit, fields=fields)
+    return responses.json_response(data)
+
+@insights_bp.route('/insights/reddit/stream', methods=['GET'])
+@token_required
+@limit('expensive')
+def reddit_stream(current_user):
+    """Stream up to STREAM_MAX_POSTS posts as NDJSON, one post per line.
+    The first page is fetched before responding, so a missing subreddit is
+    a 404; a failure after that is reported as a final {"error": ...} line."""
+    subreddit = request.args.get('subreddit', 'technology')
+    limit = request.args.get('limit', 1000, type=int)
+
+    if not Validator.validate_subreddit(subreddit):
+        return jsonify({'error': 'Invalid subreddit name'}), 400
+
+    if limit < 1:
+        limit = 1000
+    limit = min(limit, STREAM_MAX_POSTS)
+
+    fields, error = _fields_arg(wrappers.RedditWrapper.POST_FIELDS)
+    if error:
+        return error
+
+    def failure(e):
+        status = getattr(getattr(e, 'response', None), 'status_code', None)
+        if status in (403, 404):
+            return {'error': 'No subreddit found or access forbidden', 'status': status}, 404
+        return {'error': 'Failed to fetch Reddit data', 'status': status}, 502
+
+    posts = wrappers.RedditWrapper.iter_subreddit_posts(subreddit, limit, fields=fields)
+    try:
+        first = next(posts, None)
+    except requests.RequestException as e:
+        body, status = failure(e)
+        return jsonify(body), status
+
+    def generate():
+        try:
+            if first is None:
+                return
+            yield responses.dumps(first) + b'\n'
+            for post in posts:
+                yield responses.dumps(post) + b'\n'
+        except requests.RequestException as e:
+            yield responses.dumps(failure(e)[0]) + b'\n'
+        finally:
+            posts.close()
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
 @insights_bp.route('/insights/linkedin/company', methods=['GET'])
 @token_required
-@limiter.limit("5/minute")
+@limit('expensive')
 def linkedin_company(current_user):
     name = request.args.get('name') or request.args.get('linkedinName')
     if not name:
         return jsonify({'error': 'Missing required parameter: name'}), 400
-    data = LinkedInWrapper.get_company_by_name(name)
-    return jsonify(data), 200
+    fields, error = _fields_arg()
+    if error:
+        return error
+    data = wrappers.LinkedInWrapper.get_company_by_name(name, fields=fields)
+    return responses.json_response(data)
 
 @insights_bp.route('/insights/youtube/channels', methods=['GET'])
 @token_required
-@limiter.limit("5/minute")
+@limit('search')
 def youtube_channel_search(current_user):
     """Search YouTube channels by name with sorting."""
     query = request.args.get('q')
@@ -50,12 +126,15 @@ def youtube_channel_search(current_user):
     if max_results < 1 or max_results > 50:
         max_results = 10
 
-    data = YouTubeWrapper.search_channels(query=query, max_results=max_results, sort=sort, order=order)
-    return jsonify(data), 200
+    fields, error = _fields_arg(wrappers.YouTubeWrapper.CHANNEL_FIELDS)
+    if error:
+        return error
+    data = wrappers.YouTubeWrapper.search_channels(query=query, max_results=max_results, sort=sort, order=order, fields=fields)
+    return responses.json_response(data)
 
 @insights_bp.route('/insights/youtube', methods=['GET'])
 @token_required
-@limiter.limit("10/minute")
+@limit('insights')
 def youtube_insights(current_user):
     channel_id = request.args.get('channel_id')
 
@@ -65,12 +144,15 @@ def youtube_insights(current_user):
     if not Validator.validate_channel_id(channel_id):
         return jsonify({'error': 'Invalid channel ID format'}), 400
 
-    data = YouTubeWrapper.get_channel_stats(channel_id)
-    return jsonify(data), 200
+    fields, error = _fields_arg(wrappers.YouTubeWrapper.CHANNEL_FIELDS)
+    if error:
+        return error
+    data = wrappers.YouTubeWrapper.get_channel_stats(channel_id, fields=fields)
+    return responses.json_response(data)
 
 @insights_bp.route('/insights/youtube/search', methods=['GET'])
 @token_required
-@limiter.limit("5/minute")
+@limit('search')
 def youtube_search(current_user):
     query = request.args.get('q')
     max_results = request.args.get('max_results', 5, type=int)
@@ -81,20 +163,314 @@ def youtube_search(current_user):
     if max_results < 1 or max_results > 50:
         max_results = 5
 
-    data = YouTubeWrapper.search_videos(query, max_results)
-    return jsonify(data), 200
+    fields, error = _fields_arg(wrappers.YouTubeWrapper.VIDEO_FIELDS)
+    if error:
+        return error
+    data = wrappers.YouTubeWrapper.search_videos(query, max_results, fields=fields)
+    return responses.json_response(data)
+
+def _batch_target(target):
+    """Validate one batch target; returns (key, job, error)."""
+    if not isinstance(target, dict):
+        return None, None, 'Target must be an object'
+    platform = target.get('platform')
+    if platform == 'reddit':
+        subreddit = target.get('subreddit', '')
+        limit = target.get('limit', 10)
+        if not isinstance(subreddit, str) or not Validator.validate_subreddit(subreddit):
+            return None, None, 'Invalid subreddit name'
+        if not isinstance(limit, int) or isinstance(limit, bool) or limit < 1 or limit > 100:
+            limit = 10
+        return f"reddit:{subreddit.lower()}:{limit}", (subreddit, limit), None
+    if platform == 'youtube':
+        channel_id = target.get('channel_id', '')
+        if not isinstance(channel_id, str) or not Validator.validate_channel_id(channel_id):
+            return None, None, 'Invalid channel ID format'
+        return f"youtube:{channel_id}", channel_id, None
+    if platform == 'linkedin':
+        name = target.get('name') or ''
+        if not isinstance(name, str):
+            return None, None, 'Invalid company name'
+        name = name.strip()
+        if not name:
+            return None, None, 'Missing required parameter: name'
+        return f"linkedin:{name.lower()}", name, None
+    return None, None, 'Unsupported platform'
+
+@insights_bp.route('/insights/batch', methods=['POST'])
+@token_required
+@limit('expensive')
+def batch_insights(current_user):
+    """Fetch many reddit/youtube/linkedin targets in one call.
+
+    Body: {"targets": [{"platform": "reddit", "subreddit": ..., "limit": ...},
+                       {"platform": "youtube", "channel_id": ...},
+                       {"platform": "linkedin", "name": ...}]}
+    Duplicate targets are fetched once; results are keyed per target.
+    """
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Body must be a JSON object'}), 400
+    targets = payload.get('targets')
+    if not isinstance(targets, list) or not targets:
+        return jsonify({'error': 'targets must be a non-empty list'}), 400
+    if len(targets) > BATCH_MAX_TARGETS:
+        return jsonify({'error': f'Too many targets (max {BATCH_MAX_TARGETS})'}), 400
+
+    results = {}
+    jobs = {'reddit': {}, 'youtube': {}, 'linkedin': {}}
+    for index, target in enumerate(targets):
+        key, job, error = _batch_target(target)
+        if error:
+            results[f"invalid:{index}"] = {'error': error}
+        elif key not in results:
+            results[key] = None
+            jobs[key.split(':', 1)[0]][key] = job
+
+    futures = {}
+    for key, (subreddit, limit) in jobs['reddit'].items():
+        futures[key] = _batch_executor.submit(wrappers.RedditWrapper.get_subreddit_posts, subreddit, limit)
+    for key, name in jobs['linkedin'].items():
+        futures[key] = _batch_executor.submit(wrappers.LinkedInWrapper.get_company_by_name, name)
+    channel_ids = list(jobs['youtube'].values())
+    size = wrappers.YouTubeWrapper.CHANNELS_PER_REQUEST
+    chunks = {}
+    for i in range(0, len(channel_ids), size):
+        chunk = channel_ids[i:i + size]
+        chunks[_batch_executor.submit(wrappers.YouTubeWrapper.get_channels_stats, chunk)] = chunk
+
+    for key, future in futures.items():
+        try:
+            results[key] = future.result()
+        except Exception as e:
+            results[key] = {'error': f'Failed to fetch data: {str(e)}'}
+    for future, chunk in chunks.items():
+        try:
+            fetched = future.result()
+        except Exception as e:
+            fetched = {channel_id: {'error': f'Failed to fetch data: {str(e)}'} for channel_id in chunk}
+        for channel_id, data in fetched.items():
+            results[f"youtube:{channel_id}"] = data
+
+    return responses.json_response({
+        'requested': len(targets),
+        'unique': sum(len(group) for group in jobs.values()),
+        'results': results
+    }, reuse=False)
+
+def _csv_arg(name: str):
+    return [item.strip() for item in request.args.get(name, '').split(',') if item.strip()]
+
+@insights_bp.route('/insights/analytics', methods=['GET'])
+@token_required
+@limit('expensive')
+def engagement_analytics(current_user):
+    """Percentiles, engagement ratios, score velocity, top-k and outliers over
+    many subreddits' posts and/or many channels' stats.
+
+    Query: subreddits=a,b,c  posts=<per subreddit>  channel_ids=x,y
+           top_k=10  percentiles=50,90,99
+    """
+    if not analytics.available():
+        return jsonify({'error': 'Analytics requires numpy'}), 501
+    subreddits = list(dict.fromkeys(_csv_arg('subreddits')))
+    channel_ids = list(dict.fromkeys(_csv_arg('channel_ids')))
+    per_subreddit = request.args.get('posts', 500, type=int)
+    k = request.args.get('top_k', 10, type=int)
+    if not subreddits and not channel_ids:
+        return jsonify({'error': 'subreddits or channel_ids parameter required'}), 400
+    if len(subreddits) > ANALYTICS_MAX_SUBREDDITS:
+        return jsonify({'error': f'Too many subreddits (max {ANALYTICS_MAX_SUBREDDITS})'}), 400
+    if len(channel_ids) > BATCH_MAX_TARGETS:
+        return jsonify({'error': f'Too many channel IDs (max {BATCH_MAX_TARGETS})'}), 400
+    if any(not Validator.validate_subreddit(name) for name in subreddits):
+        return jsonify({'error': 'Invalid subreddit name'}), 400
+    if any(not Validator.validate_channel_id(channel_id) for channel_id in channel_ids):
+        return jsonify({'error': 'Invalid channel ID format'}), 400
+    try:
+        percentiles = [float(p) for p in _csv_arg('percentiles')] or list(analytics.DEFAULT_PERCENTILES)
+    except ValueError:
+        return jsonify({'error': 'percentiles must be numbers'}), 400
+    if any(p < 0 or p > 100 for p in percentiles):
+        return jsonify({'error': 'percentiles must be between 0 and 100'}), 400
+    if per_subreddit < 1 or per_subreddit > ANALYTICS_MAX_POSTS:
+        per_subreddit = 500
+    if k < 1 or k > 100:
+        k = 10
+
+    futures = {name: _batch_executor.submit(wrappers.RedditWrapper.get_subreddit_listing, name, per_subreddit)
+               for name in subreddits}
+    size = wrappers.YouTubeWrapper.CHANNELS_PER_REQUEST
+    chunks = {}
+    for i in range(0, len(channel_ids), size):
+        chunk = channel_ids[i:i + size]
+        chunks[_batch_executor.submit(wrappers.YouTubeWrapper.get_channels_stats, chunk)] = chunk
+
+    listings, errors = {}, {}
+    for name, future in futures.items():
+        try:
+            result = future.result()
+        except Exception as e:
+            errors[name] = f'Failed to fetch data: {str(e)}'
+            listings[name] = []
+            continue
+        if result.get('message') not in (None, 'No posts found'):
+            errors[name] = result['message']
+        listings[name] = result.get('posts', [])
+    channels = []
+    for future, chunk in chunks.items():
+        try:
+            fetched = future.result()
+        except Exception as e:
+            errors.update({channel_id: f'Failed to fetch data: {str(e)}' for channel_id in chunk})
+            continue
+        for channel_id, data in fetched.items():
+            if 'error' in data:
+                errors[channel_id] = data['error']
+            else:
+                channels.append(data)
+
+    payload = {'percentiles': percentiles, 'errors': errors}
+    if subreddits:
+        payload['reddit'] = analytics.post_analytics(listings, percentiles, k)
+    if channel_ids:
+        payload['youtube'] = analytics.channel_analytics(channels, percentiles, k)
+    return responses.json_response(payload, reuse=False)
+
+def _history_window():
+    hours = request.args.get('hours', 24, type=int)
+    if hours < 1 or hours > HISTORY_MAX_HOURS:
+        hours = 24
+    return int(time.time()) - hours * 3600, hours
+
+@insights_bp.route('/insights/reddit/history', methods=['GET'])
+@token_required
+@limit('insights')
+def reddit_history(current_user):
+    """Score and comment growth from recorded snapshots, without calling Reddit.
+    With post_id: that post's series; otherwise the subreddit's fastest-rising posts."""
+    since, hours = _history_window()
+    post_id = request.args.get('post_id')
+    if post_id:
+        data = snapshots.store.post_history(post_id, since)
+        if data is None:
+            return jsonify({'error': 'No snapshots for this post'}), 404
+        return responses.json_response(dict(data, hours=hours), reuse=False)
+
+    subreddit = request.args.get('subreddit', 'technology')
+    max_posts = request.args.get('limit', 25, type=int)
+    if not Validator.validate_subreddit(subreddit):
+        return jsonify({'error': 'Invalid subreddit name'}), 400
+    if max_posts < 1 or max_posts > 100:
+        max_posts = 25
+    posts = snapshots.store.subreddit_velocity(subreddit, since, max_posts)
+    return responses.json_response({'subreddit': subreddit, 'hours': hours, 'posts_count': len(posts),
+                                    'posts': posts}, reuse=False)
+
+@insights_bp.route('/insights/youtube/history', methods=['GET'])
+@token_required
+@limit('insights')
+def youtube_history(current_user):
+    """Subscriber/view growth for a channel from recorded snapshots, without calling YouTube."""
+    channel_id = request.args.get('channel_id')
+    if not channel_id:
+        return jsonify({'error': 'channel_id parameter required'}), 400
+    if not Validator.validate_channel_id(channel_id):
+        return jsonify({'error': 'Invalid channel ID format'}), 400
+    since, hours = _history_window()
+    data = snapshots.store.channel_history(channel_id, since)
+    if data is None:
+        return jsonify({'error': 'No snapshots for this channel'}), 404
+    return responses.json_response(dict(data, hours=hours), reuse=False)
 
 @insights_bp.route('/trending', methods=['GET'])
 @token_required
-@limiter.limit("10/minute")
+@limit('insights')
 def get_trending(current_user):
     platform = request.args.get('platform', 'reddit')
 
-    if platform == 'reddit':
-        data = RedditWrapper.get_subreddit_posts('all', limit=5)
-    elif platform == 'youtube':
-        data = YouTubeWrapper.search_videos('trending', max_results=5)
-    else:
+    allowed = {'reddit': wrappers.RedditWrapper.POST_FIELDS, 'youtube': wrappers.YouTubeWrapper.VIDEO_FIELDS}.get(platform)
+    if allowed is None:
         return jsonify({'error': 'Unsupported platform'}), 400
+    fields, error = _fields_arg(allowed)
+    if error:
+        return error
+
+    # Dashboards poll this; when quota runs low they get the cached result rather than a new search
+    with quota.background():
+        if platform == 'reddit':
+            data = wrappers.RedditWrapper.get_subreddit_posts('all', limit=5, fields=fields)
+        else:
+            data = wrappers.YouTubeWrapper.search_videos('trending', max_results=5, fields=fields)
+
+    return responses.json_response(data)
+
+@insights_bp.route('/cache/stats', methods=['GET'])
+@token_required
+def cache_stats(current_user):
+    return jsonify(dict(cache.stats(), snapshots=snapshots.store.stats(), tokens=tokens.stats())), 200
+
+@insights_bp.route('/upstreams', methods=['GET'])
+@token_required
+def upstream_health(current_user):
+    """Circuit breaker and concurrency limit state per upstream host (this worker)."""
+    return jsonify(resilience.snapshot()), 200
 
-    return jsonify(data), 200
+@insights_bp.route('/quota', methods=['GET'])
+@token_required
+def quota_status(current_user):
+    """YouTube Data API units used today across all workers, and the reserves."""
+    return jsonify({'youtube': quota.youtube.snapshot()}), 200
+
+@insights_bp.route('/profiler', methods=['GET'])
+@admin_required
+def profiler_status(current_user):
+    """Profiler settings and samples collected so far per route, over all workers."""
+    return jsonify(profiler.status()), 200
+
+@insights_bp.route('/profiler', methods=['POST'])
+@admin_required
+def profiler_configure(current_user):
+    """Switch sampling on or off for every worker. Body: enabled, sample_rate
+    (share of requests, 0-1), interval_ms, duration (seconds), clear."""
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Body must be a JSON object'}), 400
+    for name in ('enabled', 'clear'):
+        if not isinstance(data.get(name, False), bool):
+            return jsonify({'error': f'{name} must be true or false'}), 400
+    for name in ('sample_rate', 'interval_ms', 'duration'):
+        value = data.get(name, 0)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            return jsonify({'error': f'{name} must be a number'}), 400
+    settings = profiler.configure(
+        enabled=data.get('enabled', True),
+        sample_rate=data.get('sample_rate', 0.1),
+        interval_ms=data.get('interval_ms', 5),
+        duration=data.get('duration', 300),
+        clear=data.get('clear', False),
+    )
+    return jsonify(settings), 200
+
+@insights_bp.route('/profiler', methods=['DELETE'])
+@admin_required
+def profiler_clear(current_user):
+    """Stop sampling and drop the collected stacks."""
+    return jsonify(profiler.configure(enabled=False, clear=True)), 200
+
+@insights_bp.route('/profiler/stacks', methods=['GET'])
+@admin_required
+def profiler_stacks(current_user):
+    """Collapsed stacks of one route (`route=` as listed by GET /profiler),
+    ready for flamegraph.pl or speedscope."""
+    route = request.args.get('route')
+    if not route:
+        return jsonify({'error': 'route is required'}), 400
+    return Response(profiler.collapsed(route), mimetype='text/plain'), 200
+
+@insights_bp.route('/http/stats', methods=['GET'])
+@token_required
+def http_stats(current_user):
+    return jsonify({**http_pool.stats(), 'responses': responses.stats()}), 200
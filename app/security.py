@@ -21,5 +21,7 @@ class RateLimitConfig:
     LIMITS = {
         'default': '20/minute',
         'login': '5/minute',
-        'search': '10/minute'
+        'insights': '10/minute',
+        'search': '5/minute',
+        'expensive': '5/minute'
     }
@@ -0,0 +1,158 @@
+"""Vectorized engagement statistics over fetched posts and channel stats.
+
+Rows are turned into numpy columns once; percentiles, ratios, velocities,
+top-k and outliers are then whole-array operations, so tens of thousands of
+rows cost a few milliseconds rather than a Python loop per statistic.
+
+numpy is optional and imported on first use (`available()`), so processes
+that never serve analytics do not pay for loading it.
+"""
+import time
+
+np = None
+
+DEFAULT_PERCENTILES = (50, 90, 99)
+# Posts younger than this are treated as this old so velocity does not explode
+MIN_AGE_HOURS = 0.25
+# Tukey fences on log1p values; log scale because engagement is heavy-tailed
+OUTLIER_IQR_FACTOR = 1.5
+
+
+def available() -> bool:
+    """Import numpy if needed; False when it is not installed."""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:  # optional dependency
+            return False
+        np = numpy
+    return True
+
+
+def _column(rows: list, field: str):
+    # Upstream counts may arrive as strings (YouTube) or be missing
+    return np.fromiter((float(row.get(field) or 0) for row in rows), dtype=np.float64, count=len(rows))
+
+def _ratio(numerator, denominator):
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
+
+def _round(value):
+    return round(float(value), 4)
+
+def summary(values, percentiles=DEFAULT_PERCENTILES) -> dict:
+    if not values.size:
+        return {'count': 0}
+    points = np.percentile(values, percentiles)
+    return {
+        'count': int(values.size),
+        'mean': _round(values.mean()),
+        'std': _round(values.std()),
+        'min': _round(values.min()),
+        'max': _round(values.max()),
+        'percentiles': {f'p{pct:g}': _round(point) for pct, point in zip(percentiles, points)},
+    }
+
+def top_k(values, k: int):
+    """Indices of the k largest values, largest first (argpartition, then sort only k)."""
+    k = min(k, values.size)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    candidates = np.argpartition(values, -k)[-k:]
+    return candidates[np.argsort(values[candidates])[::-1]]
+
+def outliers(values):
+    """Indices above the upper Tukey fence of log1p(values), most extreme first."""
+    if values.size < 4:
+        return np.empty(0, dtype=np.intp)
+    logged = np.log1p(np.clip(values, 0, None))
+    q1, q3 = np.percentile(logged, (25, 75))
+    fence = q3 + OUTLIER_IQR_FACTOR * (q3 - q1)
+    found = np.flatnonzero(logged > fence)
+    return found[np.argsort(logged[found])[::-1]]
+
+
+def post_analytics(listings: dict, percentiles=DEFAULT_PERCENTILES, k: int = 10, now: float = None) -> dict:
+    """Stats over parsed Reddit posts, given as {subreddit: [post, ...]}."""
+    names = list(listings)
+    posts = [post for name in names for post in listings[name]]
+    if not posts:
+        return {'count': 0}
+    now = now if now is not None else time.time()
+    score = _column(posts, 'score')
+    comments = _column(posts, 'comments')
+    created = _column(posts, 'created')
+    age_hours = np.maximum((now - created) / 3600, MIN_AGE_HOURS)
+    velocity = score / age_hours
+    comments_per_point = _ratio(comments, score)
+
+    group = np.repeat(np.arange(len(names)), [len(listings[name]) for name in names])
+    counts = np.bincount(group, minlength=len(names))
+    by_subreddit = {
+        name: {
+            'count': int(count),
+            'mean_score': _round(score_sum / count),
+            'mean_comments': _round(comment_sum / count),
+            'mean_velocity': _round(velocity_sum / count),
+        }
+        for name, count, score_sum, comment_sum, velocity_sum in zip(
+            names, counts, np.bincount(group, score, len(names)), np.bincount(group, comments, len(names)),
+            np.bincount(group, velocity, len(names)))
+        if count
+    }
+
+    def describe(index):
+        post = posts[index]
+        return {
+            'id': post.get('id'),
+            'subreddit': names[group[index]],
+            'title': post.get('title'),
+            'score': int(score[index]),
+            'comments': int(comments[index]),
+            'score_per_hour': _round(velocity[index]),
+        }
+
+    return {
+        'count': len(posts),
+        'score': summary(score, percentiles),
+        'comments': summary(comments, percentiles),
+        'score_per_hour': summary(velocity, percentiles),
+        'comments_per_point': summary(comments_per_point, percentiles),
+        'by_subreddit': by_subreddit,
+        'top_by_score': [describe(i) for i in top_k(score, k)],
+        'top_by_velocity': [describe(i) for i in top_k(velocity, k)],
+        'velocity_outliers': [describe(i) for i in outliers(velocity)[:k]],
+    }
+
+
+def channel_analytics(channels: list, percentiles=DEFAULT_PERCENTILES, k: int = 10) -> dict:
+    """Stats over YouTube channel records (subscribers, total_views, total_videos)."""
+    if not channels:
+        return {'count': 0}
+    subscribers = _column(channels, 'subscribers')
+    views = _column(channels, 'total_views')
+    videos = _column(channels, 'total_videos')
+    views_per_video = _ratio(views, videos)
+    views_per_subscriber = _ratio(views, subscribers)
+
+    def describe(index):
+        channel = channels[index]
+        return {
+            'channel_id': channel.get('channel_id'),
+            'channel_name': channel.get('channel_name'),
+            'subscribers': int(subscribers[index]),
+            'total_views': int(views[index]),
+            'views_per_video': _round(views_per_video[index]),
+            'views_per_subscriber': _round(views_per_subscriber[index]),
+        }
+
+    return {
+        'count': len(channels),
+        'subscribers': summary(subscribers, percentiles),
+        'total_views': summary(views, percentiles),
+        'views_per_video': summary(views_per_video, percentiles),
+        'views_per_subscriber': summary(views_per_subscriber, percentiles),
+        'top_by_subscribers': [describe(i) for i in top_k(subscribers, k)],
+        'top_by_views_per_video': [describe(i) for i in top_k(views_per_video, k)],
+        'views_per_subscriber_outliers': [describe(i) for i in outliers(views_per_subscriber)[:k]],
+    }
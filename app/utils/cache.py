@@ -1,11 +1,36 @@
 import os
 import json
+import time
+import asyncio
+import hashlib
+import inspect
+import threading
+import dataclasses
+from collections import OrderedDict
+from functools import wraps
+from app.utils.singleflight import SingleFlight, AsyncSingleFlight, RedisLease
+from app.utils import metrics, quota, timing
+from app.utils.refresh import RefreshScheduler
 try:
     import redis
 except ImportError:  # optional dependency for later
     redis = None
 
 REDIS_URL = os.getenv('REDIS_URL')
+LOCAL_MAX_ENTRIES = int(os.getenv('CACHE_LOCAL_MAX_ENTRIES', 1024))
+KEY_PREFIX = os.getenv('CACHE_KEY_PREFIX', 'si')
+COALESCE_ACROSS_WORKERS = os.getenv('CACHE_COALESCE_ACROSS_WORKERS', 'false').lower() == 'true'
+LEASE_TTL = float(os.getenv('CACHE_LEASE_TTL', 15))
+# Defaults for results a wrapper classifies as NOT_FOUND (remembered so
+# repeated lookups of missing things stay off the upstream) and FAILED
+# (a brief backoff before the upstream is tried again)
+NEGATIVE_TTL = int(os.getenv('CACHE_NEGATIVE_TTL', 300))
+FAILURE_TTL = int(os.getenv('CACHE_FAILURE_TTL', 10))
+
+# Result classes returned by a `cached(classify=...)` function
+OK = 'ok'
+NOT_FOUND = 'not_found'
+FAILED = 'failed'
 _client = None
 
 if redis and REDIS_URL:
@@ -14,10 +39,19 @@ if redis and REDIS_URL:
     except Exception:
         _client = None
 
+def json_default(value):
+    """json.dumps fallback: dataclass records (app.wrappers.records) as plain objects."""
+    if dataclasses.is_dataclass(value):
+        return {field.name: getattr(value, field.name) for field in dataclasses.fields(value)}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
 def get(key: str):
     if not _client:
         return None
-    val = _client.get(key)
+    try:
+        val = _client.get(key)
+    except Exception:
+        return None
     if not val:
         return None
     try:
@@ -29,7 +63,377 @@ def set(key: str, value, ex: int = 300):
     if not _client:
         return False
     try:
-        _client.set(key, json.dumps(value), ex=ex)
+        _client.set(key, json.dumps(value, default=json_default), ex=ex)
         return True
     except Exception:
         return False
+
+
+class LRUCache:
+    """Thread-safe in-process cache bounded by entry count, with per-entry TTL.
+
+    Entries may carry a stale window after their TTL: `get` only returns
+    fresh values, while `get_entry` also hands back stale ones.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_entry(self, key: str):
+        """Return (value, fresh_remaining_seconds), or None once fully expired.
+        Expired entries stay in place until evicted so `peek` can fall back on them."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, fresh_until, expires_at = entry
+            now = time.monotonic()
+            if expires_at <= now:
+                return None
+            self._data.move_to_end(key)
+            return value, fresh_until - now
+
+    def peek(self, key: str):
+        """Last stored value for `key`, however old, without touching LRU order."""
+        with self._lock:
+            entry = self._data.get(key)
+        return entry[0] if entry is not None else None
+
+    def get(self, key: str):
+        entry = self.get_entry(key)
+        if entry is None or entry[1] <= 0:
+            return None
+        return entry[0]
+
+    def fresh_remaining(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is None:
+            return None
+        return entry[1] - time.monotonic()
+
+    def set(self, key: str, value, ttl: float, stale_ttl: float = 0):
+        now = time.monotonic()
+        with self._lock:
+            self._data[key] = (value, now + ttl, now + ttl + stale_ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_local = LRUCache(LOCAL_MAX_ENTRIES)
+_flight = SingleFlight()
+_async_flight = AsyncSingleFlight()
+_lease = RedisLease(_client, ttl=LEASE_TTL, prefix=f"{KEY_PREFIX}:lease") if _client and COALESCE_ACROSS_WORKERS else None
+_refresher = RefreshScheduler(_local.fresh_remaining)
+# Stale refreshes started by async callers, by key; holds the tasks (the loop keeps only weak references)
+_background_refreshes = {}
+_stats_lock = threading.Lock()
+_stats = {'local_hits': 0, 'redis_hits': 0, 'stale_hits': 0, 'misses': 0, 'coalesced': 0,
+          'fallbacks': 0, 'negative_stores': 0, 'failure_backoffs': 0, 'entity_hits': 0, 'entity_misses': 0}
+
+def _count(name: str):
+    with _stats_lock:
+        _stats[name] += 1
+    metrics.cache_event(name)
+
+def make_key(namespace: str, func, args, kwargs) -> str:
+    """Build a cache key from the call's arguments, bound to the function
+    signature so positional, keyword and defaulted forms hash the same."""
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    normalized = {
+        name: value.strip() if isinstance(value, str) else value
+        for name, value in bound.arguments.items()
+    }
+    digest = hashlib.sha1(json.dumps(normalized, sort_keys=True, default=str).encode()).hexdigest()
+    return f"{KEY_PREFIX}:{namespace}:{digest}"
+
+
+class _Policy:
+    __slots__ = ('namespace', 'ttl', 'stale_ttl', 'classify', 'negative_ttl', 'failure_ttl')
+
+    def __init__(self, namespace, ttl, stale_ttl, classify, negative_ttl, failure_ttl):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.classify = classify
+        self.negative_ttl = negative_ttl
+        self.failure_ttl = failure_ttl
+
+
+def _store(key: str, value, ttl: float, stale_ttl: float = 0):
+    _local.set(key, value, ttl, stale_ttl)
+    # Redis keeps the fresh deadline next to the value so other workers can tell stale from fresh
+    set(key, {'v': value, 'f': time.time() + ttl}, ex=int(ttl + stale_ttl))
+
+def _redis_entry(key: str):
+    """Return (value, fresh_remaining_seconds) from Redis, or None."""
+    envelope = get(key)
+    if not isinstance(envelope, dict) or 'v' not in envelope:
+        return None
+    return envelope['v'], envelope.get('f', 0) - time.time()
+
+async def offload(func, *args, **kwargs):
+    """Call `func` from a coroutine. With Redis configured it runs in a
+    thread, because the client blocks for a round trip and would stall every
+    request on the event loop; without Redis it is all local and runs inline."""
+    if _client is None:
+        return func(*args, **kwargs)
+    return await asyncio.to_thread(func, *args, **kwargs)
+
+def _lookup(key: str, policy: _Policy, remote: bool = True):
+    """Return (value, fresh) from the local tier, then Redis unless `remote`
+    is false; None on a miss. Stale entries are only returned when the
+    policy has a stale window."""
+    entry = _local.get_entry(key)
+    tier = 'local_hits'
+    if entry is None and remote:
+        entry = _redis_entry(key)
+        tier = 'redis_hits'
+        if entry is not None:
+            value, remaining = entry
+            _local.set(key, value, max(remaining, 0), policy.stale_ttl + min(remaining, 0))
+    if entry is None:
+        return None
+    value, remaining = entry
+    if remaining > 0:
+        _count(tier)
+        return value, True
+    if policy.stale_ttl:
+        _count('stale_hits')
+        return value, False
+    return None
+
+# Returned by a lease wait when the holder released without publishing
+_RELEASED = object()
+
+def _fill(key: str, policy: _Policy, func, args, kwargs):
+    """Run the upstream call once per key in this process and, when a
+    lease is configured, once per key across workers."""
+    token = None
+    if _lease:
+        token = _lease.acquire(key)
+        if token is None:
+            # Another worker is fetching; wait for it to publish a fresh result, or
+            # to give the lease up without one (its call failed)
+            def published():
+                entry = _redis_entry(key)
+                if entry and entry[1] > 0:
+                    return entry[0]
+                return None if _lease.held(key) else _RELEASED
+            value = _lease.wait_for(published, timeout=LEASE_TTL)
+            if value is _RELEASED:
+                fallback = _local.peek(key)
+                if fallback is not None:
+                    # The upstream is failing: keep serving what we had, as _settle would
+                    _count('fallbacks')
+                    if policy.failure_ttl:
+                        _count('failure_backoffs')
+                        _local.set(key, fallback, policy.failure_ttl, policy.stale_ttl)
+                    return fallback
+            elif value is not None:
+                _local.set(key, value, policy.ttl, policy.stale_ttl)
+                return value
+        else:
+            entry = _redis_entry(key)
+            if entry is not None and entry[1] > 0:
+                _lease.release(key, token)
+                _local.set(key, entry[0], entry[1], policy.stale_ttl)
+                return entry[0]
+    try:
+        return _settle(key, policy, func(*args, **kwargs))
+    finally:
+        if token is not None:
+            _lease.release(key, token)
+
+async def _fill_async(key: str, policy: _Policy, func, args, kwargs):
+    return await offload(_settle, key, policy, await func(*args, **kwargs))
+
+def _settle(key: str, policy: _Policy, value):
+    """Store the result according to its class and return what to serve.
+
+    OK results get the full TTL (and stale window); NOT_FOUND ones the
+    negative TTL in both tiers. A FAILED call (timeout, 5xx, circuit open)
+    serves the last value we had for the key, even if expired, or else the
+    failure, and either is held in this worker for the failure TTL so the
+    upstream is not retried on every request."""
+    outcome = policy.classify(value)
+    if outcome == OK:
+        _store(key, value, policy.ttl, policy.stale_ttl)
+        return value
+    if outcome == NOT_FOUND:
+        _count('negative_stores')
+        if policy.negative_ttl:
+            _store(key, value, policy.negative_ttl)
+        return value
+    fallback = _local.peek(key)
+    if fallback is not None:
+        _count('fallbacks')
+        value = fallback
+    if policy.failure_ttl:
+        # Local only: another worker may well have a good result to share
+        _count('failure_backoffs')
+        _local.set(key, value, policy.failure_ttl, policy.stale_ttl if fallback is not None else 0)
+    return value
+
+def classify_errors(result) -> str:
+    """Default classification: a dict carrying an 'error' key is FAILED,
+    unless its 'status' says the thing does not exist."""
+    if not (isinstance(result, dict) and 'error' in result):
+        return OK
+    return NOT_FOUND if result.get('status') in (404, 410) else FAILED
+
+def cached(namespace: str, ttl: int, classify=classify_errors, stale_ttl: int = 0,
+           negative_ttl: int = NEGATIVE_TTL, failure_ttl: int = FAILURE_TTL):
+    """Cache a wrapper call in the local LRU, then Redis when configured.
+    Works on both plain and coroutine functions; a sync and an async
+    wrapper registered under the same namespace share entries.
+
+    `classify` sorts a result into OK, NOT_FOUND or FAILED (see `_settle`
+    for what each is cached as); wrappers pass one that knows how their
+    upstream reports missing things. The default is `classify_errors`.
+
+    With `stale_ttl`, an entry past its TTL is still served for that many
+    seconds while a single background refresh replaces it
+    (stale-while-revalidate). Sync calls are also tracked so the refresh
+    scheduler can keep the most requested keys warm.
+    """
+    policy = _Policy(namespace, ttl, stale_ttl, classify, negative_ttl, failure_ttl)
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                key = make_key(namespace, func, args, kwargs)
+                fill = lambda: _fill_async(key, policy, func, args, kwargs)  # noqa: E731
+                with timing.phase('cache'):
+                    # A local hit needs no thread hop; only the Redis tier goes off the loop
+                    hit = _lookup(key, policy, remote=False)
+                    if hit is None and _client is not None:
+                        hit = await asyncio.to_thread(_lookup, key, policy)
+                if hit is not None:
+                    value, fresh = hit
+                    # A refresh already running for the key will do; don't spend a token on another
+                    if (not fresh and key not in _background_refreshes and not _async_flight.running(key)
+                            and _refresher.take_token()):
+                        # Nobody awaits the refresh here. The task copies the context, so it
+                        # runs at background quota priority
+                        with quota.background():
+                            task = asyncio.ensure_future(_async_flight.do(key, fill))
+                        _background_refreshes[key] = task
+                        task.add_done_callback(lambda _: _background_refreshes.pop(key, None))
+                    return value
+                value, shared = await _async_flight.do(key, fill)
+                _count('coalesced' if shared else 'misses')
+                return value
+        else:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                key = make_key(namespace, func, args, kwargs)
+                refresh = lambda: _flight.do(key, lambda: _fill(key, policy, func, args, kwargs))  # noqa: E731
+                if stale_ttl:
+                    _refresher.track(key, refresh)
+                with timing.phase('cache'):
+                    hit = _lookup(key, policy)
+                if hit is not None:
+                    value, fresh = hit
+                    if not fresh:
+                        _refresher.submit(key, refresh)
+                    return value
+                value, shared = refresh()
+                _count('coalesced' if shared else 'misses')
+                return value
+        wrapper.cache_namespace = namespace
+        wrapper.cache_ttl = ttl
+        wrapper.cache_stale_ttl = stale_ttl
+        return wrapper
+    return decorator
+
+class EntityStore:
+    """Per-ID records (e.g. channel statistics) that several wrapper calls
+    can both read and fill, kept in the local LRU and Redis like responses."""
+
+    def __init__(self, namespace: str, ttl: int):
+        self.namespace = namespace
+        self.ttl = ttl
+
+    def key(self, entity_id: str) -> str:
+        return f"{KEY_PREFIX}:entity:{self.namespace}:{entity_id}"
+
+    def get_many(self, entity_ids) -> dict:
+        found = {}
+        missing = []
+        for entity_id in entity_ids:
+            value = _local.get(self.key(entity_id))
+            if value is not None:
+                found[entity_id] = value
+            else:
+                missing.append(entity_id)
+        if missing and _client:
+            try:
+                raw = _client.mget([self.key(entity_id) for entity_id in missing])
+            except Exception:
+                raw = [None] * len(missing)
+            for entity_id, val in zip(missing, raw):
+                if val:
+                    found[entity_id] = json.loads(val)
+                    _local.set(self.key(entity_id), found[entity_id], self.ttl)
+        with _stats_lock:
+            _stats['entity_hits'] += len(found)
+            _stats['entity_misses'] += len(entity_ids) - len(found)
+        return found
+
+    def get(self, entity_id: str):
+        return self.get_many([entity_id]).get(entity_id)
+
+    def set_many(self, records: dict):
+        for entity_id, record in records.items():
+            _local.set(self.key(entity_id), record, self.ttl)
+        if records and _client:
+            try:
+                pipe = _client.pipeline(transaction=False)
+                for entity_id, record in records.items():
+                    pipe.set(self.key(entity_id), json.dumps(record, default=json_default), ex=self.ttl)
+                pipe.execute()
+            except Exception:
+                pass
+
+    def set(self, entity_id: str, record):
+        self.set_many({entity_id: record})
+
+def stats() -> dict:
+    with _stats_lock:
+        snapshot = dict(_stats)
+    hits = snapshot['local_hits'] + snapshot['redis_hits']
+    total = hits + snapshot['misses']
+    snapshot.update({
+        'hits': hits,
+        'hit_ratio': round(hits / total, 4) if total else 0.0,
+        'in_flight': _flight.in_flight() + _async_flight.in_flight(),
+        'local_entries': len(_local),
+        'local_max_entries': _local.max_entries,
+        'redis_enabled': _client is not None,
+        'coalesce_across_workers': _lease is not None,
+        'refresh': _refresher.stats(),
+    })
+    return snapshot
+
+def clear():
+    _local.clear()
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
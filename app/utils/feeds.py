@@ -0,0 +1,225 @@
+"""Live feeds for server-sent events, one upstream poller per feed.
+
+A feed (a platform and target, e.g. reddit:all) is polled on a schedule for
+as long as anyone is subscribed. Each poll is diffed against the previous
+one and only new or changed items (plus removals and the new order when it
+moved) are pushed. An event is encoded once and the same bytes are queued
+for every subscriber, so a thousand dashboards cost a thousand small queues
+rather than a thousand upstream polls.
+
+Slow subscribers are never waited on. When a subscriber's queue is full its
+backlog is dropped and it is sent a fresh snapshot once it reads again, so
+one stalled client cannot delay the others or grow memory without bound.
+"""
+import os
+import time
+import asyncio
+import logging
+from app.utils import responses
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = int(os.getenv('FEED_QUEUE_SIZE', 16))
+HEARTBEAT = float(os.getenv('FEED_HEARTBEAT', 15))
+MAX_FEEDS = int(os.getenv('FEED_MAX_FEEDS', 100))
+MAX_SUBSCRIBERS = int(os.getenv('FEED_MAX_SUBSCRIBERS', 10000))
+
+# An SSE comment line; keeps idle connections open through proxies
+HEARTBEAT_FRAME = b': keepalive\n\n'
+# Queued in place of the dropped backlog: "send this subscriber a snapshot"
+_RESYNC = None
+
+
+class FeedLimitExceeded(Exception):
+    """Raised when a new subscription would exceed MAX_FEEDS or MAX_SUBSCRIBERS."""
+
+
+def frame(event: str, data, event_id: str = None) -> bytes:
+    head = f"id: {event_id}\nevent: {event}\ndata: " if event_id else f"event: {event}\ndata: "
+    return head.encode() + responses.dumps(data) + b'\n\n'
+
+
+class _Subscriber:
+    __slots__ = ('queue', 'lagged')
+
+    def __init__(self, size: int):
+        self.queue = asyncio.Queue(size)
+        self.lagged = False
+
+    def offer(self, version: int, chunk: bytes):
+        if self.lagged:
+            return
+        try:
+            self.queue.put_nowait((version, chunk))
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.lagged = True
+            self.queue.put_nowait(_RESYNC)
+
+
+class Feed:
+    """Items of one upstream listing, refreshed by a poller task.
+
+    `fetch` is a coroutine function returning the current list of items, or
+    None when the upstream call failed (the previous items are kept).
+    `identify` maps an item to its stable id.
+    """
+
+    def __init__(self, key: str, fetch, interval: float, identify):
+        self.key = key
+        self.fetch = fetch
+        self.interval = interval
+        self.identify = identify
+        self.items = {}
+        self.version = 0
+        # Distinguishes event ids of this feed from an earlier feed with the same key
+        self.epoch = f'{time.time_ns():x}'
+        self.subscribers = set()
+        self.polled_at = None
+        self._ready = asyncio.Event()
+        self._task = None
+        self._snapshot = None
+        self._stats = {'polls': 0, 'failures': 0, 'updates': 0, 'resyncs': 0}
+
+    @property
+    def event_id(self) -> str:
+        return f'{self.epoch}-{self.version}'
+
+    def snapshot_frame(self) -> bytes:
+        if self._snapshot is None or self._snapshot[0] != self.version:
+            data = {'feed': self.key, 'items': list(self.items.values())}
+            self._snapshot = (self.version, frame('snapshot', data, self.event_id))
+        return self._snapshot[1]
+
+    def _publish(self, items: list):
+        current = {self.identify(item): item for item in items}
+        changed = [item for key, item in current.items() if self.items.get(key) != item]
+        removed = [key for key in self.items if key not in current]
+        reordered = list(current) != [key for key in self.items if key in current]
+        self.items = current
+        if not (changed or removed or reordered):
+            return
+        self.version += 1
+        self._stats['updates'] += 1
+        data = {'feed': self.key, 'changed': changed, 'removed': removed}
+        if reordered:
+            data['order'] = list(current)
+        chunk = frame('update', data, self.event_id)
+        for subscriber in self.subscribers:
+            subscriber.offer(self.version, chunk)
+
+    async def _poll(self):
+        while True:
+            try:
+                items = await self.fetch()
+            except Exception as e:  # the poller must outlive any one bad poll
+                logger.warning(f"Feed {self.key} poll failed: {e}")
+                items = None
+            self._stats['polls'] += 1
+            self.polled_at = time.time()
+            if items is None:
+                self._stats['failures'] += 1
+            else:
+                self._publish(items)
+            # The first attempt releases waiting subscribers even if it failed
+            self._ready.set()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._poll(), name=f'feed:{self.key}')
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def stream(self, subscriber: _Subscriber, last_event_id: str = None):
+        """SSE frames for one subscriber: a snapshot (unless it resumes at the
+        current event id), then updates, with heartbeats while idle.
+
+        Updates queued before a snapshot was taken are already in it (the
+        subscriber is registered before the first poll), so any at or below
+        the version last sent are skipped."""
+        await self._ready.wait()
+        if last_event_id != self.event_id:
+            yield self.snapshot_frame()
+        sent = self.version
+        while True:
+            try:
+                item = await asyncio.wait_for(subscriber.queue.get(), HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield HEARTBEAT_FRAME
+                continue
+            if item is _RESYNC:
+                subscriber.lagged = False
+                self._stats['resyncs'] += 1
+                sent = self.version
+                yield self.snapshot_frame()
+                continue
+            version, chunk = item
+            if version > sent:
+                sent = version
+                yield chunk
+
+    def stats(self) -> dict:
+        return dict(self._stats, subscribers=len(self.subscribers), version=self.version, items=len(self.items),
+                    interval=self.interval,
+                    polled_ago=round(time.time() - self.polled_at, 1) if self.polled_at else None)
+
+
+class FeedHub:
+    """Feeds by key for one event loop; a feed polls only while subscribed."""
+
+    def __init__(self, max_feeds: int = MAX_FEEDS, max_subscribers: int = MAX_SUBSCRIBERS,
+                 queue_size: int = QUEUE_SIZE):
+        self.max_feeds = max_feeds
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.feeds = {}
+        self._subscribers = 0
+
+    def subscribe(self, key: str, fetch, interval: float, identify, last_event_id: str = None):
+        """Register a subscriber and return its frame iterator. Raises
+        FeedLimitExceeded before anything is started, so the caller can still
+        answer with an error status."""
+        feed = self.feeds.get(key)
+        if feed is None and len(self.feeds) >= self.max_feeds:
+            raise FeedLimitExceeded('Too many live feeds')
+        if self._subscribers >= self.max_subscribers:
+            raise FeedLimitExceeded('Too many live subscribers')
+        if feed is None:
+            feed = self.feeds[key] = Feed(key, fetch, interval, identify)
+        subscriber = _Subscriber(self.queue_size)
+        feed.subscribers.add(subscriber)
+        self._subscribers += 1
+        feed.start()
+        return self._frames(feed, subscriber, last_event_id)
+
+    async def _frames(self, feed: Feed, subscriber: _Subscriber, last_event_id: str):
+        try:
+            async for chunk in feed.stream(subscriber, last_event_id):
+                yield chunk
+        finally:
+            feed.subscribers.discard(subscriber)
+            self._subscribers -= 1
+            if not feed.subscribers:
+                feed.stop()
+                if self.feeds.get(feed.key) is feed:
+                    del self.feeds[feed.key]
+
+    def close(self):
+        for feed in self.feeds.values():
+            feed.stop()
+        self.feeds.clear()
+
+    def stats(self) -> dict:
+        return {
+            'feeds': {key: feed.stats() for key, feed in self.feeds.items()},
+            'subscribers': self._subscribers,
+            'limits': {'feeds': self.max_feeds, 'subscribers': self.max_subscribers, 'queue': self.queue_size},
+        }
+
+
+hub = FeedHub()
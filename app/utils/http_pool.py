@@ -0,0 +1,211 @@
+import os
+import asyncio
+import logging
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from app.utils import metrics, resilience
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 20))
+KEEPALIVE = os.getenv('HTTP_KEEPALIVE', 'true').lower() == 'true'
+CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 3.05))
+READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 10))
+RETRIES = int(os.getenv('HTTP_RETRIES', 2))
+BACKOFF_FACTOR = float(os.getenv('HTTP_BACKOFF_FACTOR', 0.5))
+MAX_RETRY_AFTER = float(os.getenv('HTTP_MAX_RETRY_AFTER', 5))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class _Retry(Retry):
+    """Retry that honors Retry-After but never parks a worker thread for
+    longer than MAX_RETRY_AFTER seconds."""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, MAX_RETRY_AFTER)
+
+
+class HttpPool:
+    """Thread-safe registry of keep-alive sessions, one connection pool per host."""
+
+    def __init__(self, pool_size: int = POOL_SIZE, retries: int = RETRIES,
+                 backoff_factor: float = BACKOFF_FACTOR, keepalive: bool = KEEPALIVE):
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.keepalive = keepalive
+        self._sessions = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _build_session(self) -> requests.Session:
+        retry = _Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=0,
+            status=self.retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if not self.keepalive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    def session(self, host: str) -> requests.Session:
+        session = self._sessions.get(host)
+        if session is not None:
+            return session
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._sessions[host] = self._build_session()
+                self._stats[host] = {'requests': 0, 'errors': 0}
+        return session
+
+    def request(self, method: str, url: str, timeout=None, **kwargs) -> requests.Response:
+        host = urlsplit(url).netloc
+        session = self.session(host)
+        if timeout is None or isinstance(timeout, (int, float)):
+            timeout = (CONNECT_TIMEOUT, timeout or READ_TIMEOUT)
+        stats = self._stats[host]
+        upstream = resilience.guard(host)
+        started = upstream.enter()
+        with self._lock:
+            stats['requests'] += 1
+        ok = False
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+            ok = resilience.healthy_status(response.status_code)
+        except requests.RequestException as e:
+            with self._lock:
+                stats['errors'] += 1
+            metrics.upstream_error(host, e)
+            raise
+        finally:
+            upstream.exit(started, ok)
+        metrics.upstream_response(host, response.status_code)
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hosts = dict(self._sessions)
+        result = {}
+        for host, session in hosts.items():
+            adapter = session.get_adapter(f'https://{host}')
+            pools = []
+            for key in adapter.poolmanager.pools.keys():
+                conn_pool = adapter.poolmanager.pools.get(key)
+                if conn_pool is None:
+                    continue
+                pools.append({
+                    'scheme': conn_pool.scheme,
+                    'connections_opened': conn_pool.num_connections,
+                    'requests_sent': conn_pool.num_requests,
+                    'idle_connections': conn_pool.pool.qsize() if conn_pool.pool else 0,
+                })
+            result[host] = dict(self._stats[host], pools=pools)
+        return {
+            'pool_size': self.pool_size,
+            'retries': self.retries,
+            'keepalive': self.keepalive,
+            'timeouts': {'connect': CONNECT_TIMEOUT, 'read': READ_TIMEOUT},
+            'hosts': result,
+        }
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+            self._stats.clear()
+        for session in sessions:
+            session.close()
+
+
+pool = HttpPool()
+
+def after_fork():
+    """Start the current process on a fresh pool; sockets and locks inherited
+    from a pre-forking parent must not be shared with it."""
+    global pool
+    pool = HttpPool()
+
+def get(url: str, **kwargs) -> requests.Response:
+    return pool.get(url, **kwargs)
+
+def stats() -> dict:
+    return pool.stats()
+
+
+# Shared async client for the FastAPI service; opened and closed by its lifespan
+_async_client = None
+
+async def open_async_client():
+    global _async_client
+    if _async_client is None:
+        # Imported here: httpx is only needed by the async service and costs
+        # a noticeable slice of the Flask workers' start-up otherwise
+        import httpx
+        _async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=POOL_SIZE * 4,
+                max_keepalive_connections=POOL_SIZE if KEEPALIVE else 0,
+            ),
+            transport=httpx.AsyncHTTPTransport(retries=RETRIES),
+        )
+    return _async_client
+
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+def _retry_delay(response, attempt: int) -> float:
+    retry_after = response.headers.get('Retry-After')
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), MAX_RETRY_AFTER)
+    return BACKOFF_FACTOR * (2 ** attempt)
+
+async def async_get(url: str, timeout=None, **kwargs):
+    """Async GET with the same retry policy and upstream guard as the sync
+    sessions. Raises resilience.UpstreamUnavailable when the guard sheds the call."""
+    import httpx
+    client = await open_async_client()
+    if timeout is not None:
+        kwargs['timeout'] = httpx.Timeout(timeout, connect=CONNECT_TIMEOUT)
+    host = urlsplit(url).netloc
+    upstream = resilience.guard(host)
+    attempt = 0
+    while True:
+        started = upstream.enter()
+        ok = False
+        try:
+            response = await client.get(url, **kwargs)
+            ok = resilience.healthy_status(response.status_code)
+        except httpx.HTTPError as e:
+            metrics.upstream_error(host, e)
+            raise
+        finally:
+            upstream.exit(started, ok)
+        metrics.upstream_response(host, response.status_code)
+        if response.status_code not in RETRY_STATUSES or attempt >= RETRIES:
+            return response
+        await asyncio.sleep(_retry_delay(response, attempt))
+        attempt += 1
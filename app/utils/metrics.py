@@ -0,0 +1,130 @@
+"""Prometheus instrumentation shared by flask_app and fastapi_service.
+
+Under gunicorn each worker is a separate process, so PROMETHEUS_MULTIPROC_DIR
+must point at a directory shared by the workers (gunicorn.conf.py sets one
+up). /metrics then aggregates every live worker's samples. Without
+prometheus_client installed everything here is a no-op.
+"""
+import os
+import time
+import inspect
+from functools import wraps
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+        generate_latest, multiprocess,
+    )
+except ImportError:  # optional dependency
+    Counter = None
+
+ENABLED = Counter is not None and os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15)
+
+
+class _Noop:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, *args, **kwargs):
+        pass
+
+    def dec(self, *args, **kwargs):
+        pass
+
+    def observe(self, *args, **kwargs):
+        pass
+
+
+if ENABLED:
+    UPSTREAM_LATENCY = Histogram(
+        'upstream_call_duration_seconds', 'Wrapper calls that reached the upstream API',
+        ['platform', 'method'], buckets=LATENCY_BUCKETS)
+    UPSTREAM_RESPONSES = Counter(
+        'upstream_responses_total', 'Upstream HTTP responses by host and status', ['host', 'status'])
+    UPSTREAM_ERRORS = Counter(
+        'upstream_errors_total', 'Upstream requests that failed without a response', ['host', 'error'])
+    HTTP_LATENCY = Histogram(
+        'http_request_duration_seconds', 'Inbound request latency by route',
+        ['service', 'route', 'method'], buckets=LATENCY_BUCKETS)
+    HTTP_RESPONSES = Counter(
+        'http_responses_total', 'Inbound responses by route and status', ['service', 'route', 'status'])
+    IN_FLIGHT = Gauge(
+        'http_requests_in_flight', 'Inbound requests being served', ['service'], multiprocess_mode='livesum')
+    UPSTREAM_REJECTED = Counter(
+        'upstream_rejections_total', 'Upstream calls shed by the circuit breaker or concurrency limit',
+        ['host', 'reason'])
+    CACHE_EVENTS = Counter(
+        'cache_lookups_total', 'Response cache lookups by outcome', ['result'])
+    RATE_LIMITED = Counter(
+        'rate_limit_rejections_total', 'Requests rejected by the rate limiter', ['service', 'route'])
+else:
+    UPSTREAM_LATENCY = UPSTREAM_RESPONSES = UPSTREAM_ERRORS = UPSTREAM_REJECTED = _Noop()
+    HTTP_LATENCY = HTTP_RESPONSES = IN_FLIGHT = CACHE_EVENTS = RATE_LIMITED = _Noop()
+
+
+def timed(platform: str, method: str):
+    """Record the latency of a wrapper call that goes upstream. Apply it
+    below @cached so cache hits are not counted as upstream calls."""
+    def decorator(func):
+        histogram = UPSTREAM_LATENCY.labels(platform, method)
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - started)
+        else:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def upstream_response(host: str, status: int):
+    UPSTREAM_RESPONSES.labels(host, str(status)).inc()
+
+
+def upstream_error(host: str, error: Exception):
+    UPSTREAM_ERRORS.labels(host, type(error).__name__).inc()
+
+
+def upstream_rejected(host: str, reason: str):
+    UPSTREAM_REJECTED.labels(host, reason).inc()
+
+
+def cache_event(result: str):
+    CACHE_EVENTS.labels(result).inc()
+
+
+def request_started(service: str):
+    IN_FLIGHT.labels(service).inc()
+
+
+def request_finished(service: str, route: str, method: str, status: int, elapsed: float):
+    IN_FLIGHT.labels(service).dec()
+    HTTP_LATENCY.labels(service, route, method).observe(elapsed)
+    HTTP_RESPONSES.labels(service, route, str(status)).inc()
+
+
+def rate_limited(service: str, route: str):
+    RATE_LIMITED.labels(service, route).inc()
+
+
+def render():
+    """Return (body, content_type) for a /metrics response."""
+    if not ENABLED:
+        return b'# metrics disabled: prometheus_client is not installed\n', 'text/plain; charset=utf-8'
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
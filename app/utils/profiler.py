@@ -0,0 +1,228 @@
+"""Sampling profiler for a fraction of Flask requests, switched at runtime.
+
+An admin turns it on through /api/profiler. The settings go to a small
+control file that every worker re-reads at most once a second, so all
+workers follow without a restart. While it is on:
+- Each request is picked with probability `sample_rate`.
+- A sampler thread records the picked request thread's stack every
+  `interval_ms`.
+- Stacks are counted per route in collapsed form ("frame;frame;frame
+  count", what flamegraph.pl and speedscope read).
+- Each worker writes its counts to PROFILE_DIR, where the admin endpoint
+  merges them.
+
+Sampling costs nothing in the request thread itself. Nothing runs when the
+profiler is off, beyond a random draw and a throttled stat() of the
+control file.
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import tempfile
+import threading
+from collections import Counter, defaultdict
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+CONTROL_PATH = os.getenv('PROFILER_CONTROL_PATH', os.path.join(_DEFAULT_DIR, 'social-insights-profiler.json'))
+PROFILE_DIR = os.getenv('PROFILER_DIR', os.path.join(tempfile.gettempdir(), 'social-insights-profiles'))
+DEFAULT_INTERVAL_MS = float(os.getenv('PROFILER_INTERVAL_MS', 5))
+MAX_DURATION = int(os.getenv('PROFILER_MAX_DURATION', 3600))
+# Seconds between re-reading the control file, and between dumps of the counts
+CHECK_INTERVAL = 1.0
+FLUSH_INTERVAL = 5.0
+MAX_DEPTH = 64
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}:{code.co_qualname}"
+
+def collapse(frame) -> str:
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Profiler:
+    def __init__(self, control_path: str = CONTROL_PATH, profile_dir: str = PROFILE_DIR):
+        self.control_path = control_path
+        self.profile_dir = profile_dir
+        self._settings = {'enabled': False}
+        self._checked_at = 0.0
+        self._mtime = None
+        self._generation = None
+        self._lock = threading.Lock()
+        self._active = {}
+        self._stacks = defaultdict(Counter)
+        self._dirty = False
+        self._wake = threading.Event()
+        self._thread_pid = None
+
+    # Control, shared by all workers through the control file
+
+    def configure(self, enabled: bool, sample_rate: float = 0.1, interval_ms: float = DEFAULT_INTERVAL_MS,
+                  duration: int = 300, clear: bool = False) -> dict:
+        if not isinstance(enabled, bool) or not isinstance(clear, bool):
+            raise TypeError('enabled and clear must be booleans')
+        current = self._read_control()
+        generation = current.get('generation', 0) + (1 if clear else 0)
+        settings = {
+            'enabled': enabled,
+            'sample_rate': min(max(float(sample_rate), 0.0), 1.0),
+            'interval_ms': max(float(interval_ms), 1.0),
+            'until': time.time() + min(int(duration), MAX_DURATION),
+            'generation': generation,
+        }
+        if clear:
+            self._remove_dumps()
+        tmp = f'{self.control_path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as fh:
+            json.dump(settings, fh)
+        os.replace(tmp, self.control_path)
+        self._checked_at = 0.0
+        return self.settings()
+
+    def _read_control(self) -> dict:
+        try:
+            with open(self.control_path) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {}
+
+    def settings(self) -> dict:
+        now = time.monotonic()
+        if now - self._checked_at >= CHECK_INTERVAL:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.control_path).st_mtime
+            except OSError:
+                mtime = None
+            if mtime != self._mtime:
+                self._mtime = mtime
+                self._settings = self._read_control() or {'enabled': False}
+                if self._settings.get('generation') != self._generation:
+                    self._generation = self._settings.get('generation')
+                    with self._lock:
+                        self._stacks.clear()
+        return self._settings
+
+    def enabled(self) -> bool:
+        settings = self.settings()
+        return bool(settings.get('enabled')) and time.time() < settings.get('until', 0)
+
+    # Per request
+
+    def begin(self, route: str) -> bool:
+        """Maybe profile the current request; True when it was picked."""
+        if not self.enabled() or random.random() >= self._settings.get('sample_rate', 0):
+            return False
+        self._ensure_sampler()
+        with self._lock:
+            self._active[threading.get_ident()] = route
+        self._wake.set()
+        return True
+
+    def end(self):
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+
+    # Sampler thread, one per worker process
+
+    def _ensure_sampler(self):
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid != os.getpid():
+                self._thread_pid = os.getpid()
+                threading.Thread(target=self._sample_loop, name='profiler-sampler', daemon=True).start()
+
+    def _sample_loop(self):
+        flushed_at = time.monotonic()
+        while True:
+            with self._lock:
+                active = list(self._active.items())
+            if active:
+                frames = sys._current_frames()
+                with self._lock:
+                    for thread_id, route in active:
+                        frame = frames.get(thread_id)
+                        if frame is not None:
+                            self._stacks[route][collapse(frame)] += 1
+                    self._dirty = True
+                del frames
+                time.sleep(self._settings.get('interval_ms', DEFAULT_INTERVAL_MS) / 1000)
+            else:
+                self._wake.wait(FLUSH_INTERVAL)
+                self._wake.clear()
+            if self._dirty and time.monotonic() - flushed_at >= FLUSH_INTERVAL:
+                flushed_at = time.monotonic()
+                try:
+                    self.flush()
+                except OSError as e:
+                    logger.warning(f"Profiler dump failed: {e}")
+
+    # Dumps
+
+    def flush(self):
+        """Write this worker's counts to PROFILE_DIR/<pid>.json."""
+        with self._lock:
+            data = {route: dict(stacks) for route, stacks in self._stacks.items()}
+            self._dirty = False
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f'{os.getpid()}.json')
+        with open(f'{path}.tmp', 'w') as fh:
+            json.dump({'generation': self._generation, 'stacks': data}, fh)
+        os.replace(f'{path}.tmp', path)
+
+    def _dumps(self):
+        try:
+            names = [name for name in os.listdir(self.profile_dir) if name.endswith('.json')]
+        except OSError:
+            return
+        for name in names:
+            try:
+                with open(os.path.join(self.profile_dir, name)) as fh:
+                    yield json.load(fh)
+            except (OSError, ValueError):
+                continue
+
+    def _remove_dumps(self):
+        for name in os.listdir(self.profile_dir) if os.path.isdir(self.profile_dir) else ():
+            try:
+                os.remove(os.path.join(self.profile_dir, name))
+            except OSError:
+                pass
+
+    def merged(self) -> dict:
+        """{route: Counter(stack -> samples)} over every worker's last dump
+        of the current generation."""
+        generation = self._read_control().get('generation', 0)
+        routes = defaultdict(Counter)
+        for dump in self._dumps():
+            if dump.get('generation', 0) != generation:
+                continue
+            for route, stacks in dump.get('stacks', {}).items():
+                routes[route].update(stacks)
+        return routes
+
+    def collapsed(self, route: str) -> str:
+        stacks = self.merged().get(route, Counter())
+        return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+    def status(self) -> dict:
+        settings = self._read_control()
+        return {
+            'enabled': bool(settings.get('enabled')) and time.time() < settings.get('until', 0),
+            'settings': settings,
+            'routes': {route: sum(stacks.values()) for route, stacks in self.merged().items()},
+        }
+
+
+profiler = Profiler()
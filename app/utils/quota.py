@@ -0,0 +1,183 @@
+"""YouTube Data API quota accounting, shared by every worker.
+
+The API grants a daily unit budget, reset at midnight Pacific time, and
+charges per call: search.list costs 100 units, channels.list 1. The ledger
+charges each call before it is made. The running total lives in Redis when
+REDIS_URL is set, otherwise in a shared-memory counter table like the rate
+limiter's, so every worker on the host sees one total.
+
+As the budget shrinks, calls are shed by priority rather than first come:
+- Background work stops first (trending refreshes, live feeds, stale
+  refreshes).
+- Expensive searches stop next.
+- Cheap lookups such as channels.list run until the budget is gone.
+A shed call raises QuotaExhausted before any network I/O. The wrappers
+handle it like any other upstream failure, so callers get the last cached
+result instead.
+"""
+import os
+import time
+import logging
+import tempfile
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from app.utils.resilience import UpstreamUnavailable
+try:
+    from zoneinfo import ZoneInfo
+    _RESET_TZ = ZoneInfo('America/Los_Angeles')
+except Exception:  # no tz database; PST is close enough to find the day
+    _RESET_TZ = timezone(timedelta(hours=-8))
+
+logger = logging.getLogger(__name__)
+
+YOUTUBE_DAILY_UNITS = int(os.getenv('YOUTUBE_DAILY_QUOTA', 10000))
+# Calls costing at least this much count as expensive (search.list)
+EXPENSIVE_UNITS = int(os.getenv('QUOTA_EXPENSIVE_UNITS', 100))
+# Share of the daily budget kept back from expensive calls, and from background work
+EXPENSIVE_RESERVE = float(os.getenv('QUOTA_EXPENSIVE_RESERVE', 0.2))
+BACKGROUND_RESERVE = float(os.getenv('QUOTA_BACKGROUND_RESERVE', 0.5))
+_DEFAULT_SHM_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+_priority = contextvars.ContextVar('quota_priority', default=INTERACTIVE)
+
+
+class QuotaExhausted(UpstreamUnavailable):
+    """Raised instead of making a call the remaining budget is reserved against."""
+
+
+@contextmanager
+def background():
+    """Run upstream calls made inside the block (and tasks started from it)
+    at background priority."""
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def storage_uri() -> str:
+    from app.utils import shm_storage
+    return shm_storage.storage_uri(
+        os.getenv('QUOTA_STORAGE_URI'),
+        os.getenv('QUOTA_SHM_PATH', os.path.join(_DEFAULT_SHM_DIR, 'social-insights-quota')))
+
+
+class QuotaLedger:
+    """Daily unit budget for one API, charged per call name (`costs`)."""
+
+    def __init__(self, name: str, daily_units: int, costs: dict, uri: str = None):
+        self.name = name
+        self.daily_units = daily_units
+        self.costs = costs
+        self.uri = uri
+        self._storage = None
+        self._lock = threading.Lock()
+        self._stats = {'charged_units': 0, 'calls': 0, 'rejected': {INTERACTIVE: 0, BACKGROUND: 0}, 'errors': 0,
+                       'refunded_units': 0}
+
+    def storage(self):
+        if self._storage is None:
+            with self._lock:
+                if self._storage is None:
+                    # Imported here: registers the shm:// scheme and keeps this module light
+                    from limits.storage import storage_from_string
+                    from app.utils import shm_storage  # noqa: F401
+                    self._storage = storage_from_string(self.uri or storage_uri())
+        return self._storage
+
+    @staticmethod
+    def window(now: float = None):
+        """(day the budget belongs to, seconds until it resets)."""
+        local = datetime.fromtimestamp(now if now is not None else time.time(), _RESET_TZ)
+        reset = (local + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return local.strftime('%Y-%m-%d'), (reset - local).total_seconds()
+
+    def _key(self, day: str) -> str:
+        return f"quota:{self.name}:{day}"
+
+    def reserve_for(self, units: int, priority: str) -> int:
+        """Units that must remain after a call of this size and priority."""
+        if priority == BACKGROUND:
+            return int(self.daily_units * BACKGROUND_RESERVE)
+        if units >= EXPENSIVE_UNITS:
+            return int(self.daily_units * EXPENSIVE_RESERVE)
+        return 0
+
+    def spend(self, call: str) -> bool:
+        """Charge `call` or raise QuotaExhausted. Returns whether units were
+        charged: storage errors let the call through uncounted, as losing the
+        count is better than losing the API."""
+        units = self.costs.get(call, 1)
+        priority = _priority.get()
+        reserve = self.reserve_for(units, priority)
+        day, reset_in = self.window()
+        key = self._key(day)
+        # Keep the counter a little past the reset so a late call still finds it
+        expiry = int(reset_in) + 3600
+        try:
+            storage = self.storage()
+            used = storage.incr(key, expiry, amount=units)
+            if self.daily_units - used < reserve:
+                storage.incr(key, expiry, amount=-units)
+            else:
+                with self._lock:
+                    self._stats['charged_units'] += units
+                    self._stats['calls'] += 1
+                return True
+        except Exception as e:
+            logger.warning(f"Quota ledger {self.name} unavailable: {e}")
+            with self._lock:
+                self._stats['errors'] += 1
+            return False
+        with self._lock:
+            self._stats['rejected'][priority] += 1
+        raise QuotaExhausted(f"{self.name} quota reserved: {self.daily_units - used + units} units left, "
+                             f"{call} needs {units} at {priority} priority")
+
+    def refund(self, call: str):
+        """Give back what `spend(call)` charged, for a call that was never sent
+        (shed by the circuit breaker or concurrency limit)."""
+        units = self.costs.get(call, 1)
+        day, reset_in = self.window()
+        try:
+            self.storage().incr(self._key(day), int(reset_in) + 3600, amount=-units)
+        except Exception as e:
+            logger.warning(f"Quota ledger {self.name} unavailable: {e}")
+            return
+        with self._lock:
+            self._stats['charged_units'] -= units
+            self._stats['calls'] -= 1
+            self._stats['refunded_units'] += units
+
+    def used(self) -> int:
+        try:
+            return self.storage().get(self._key(self.window()[0]))
+        except Exception:
+            return None
+
+    def snapshot(self) -> dict:
+        day, reset_in = self.window()
+        used = self.used()
+        with self._lock:
+            stats = dict(self._stats, rejected=dict(self._stats['rejected']))
+        return {
+            'day': day,
+            'daily_units': self.daily_units,
+            'used': used,
+            'remaining': None if used is None else max(self.daily_units - used, 0),
+            'resets_in': int(reset_in),
+            'costs': self.costs,
+            'reserves': {
+                'expensive': int(self.daily_units * EXPENSIVE_RESERVE),
+                'background': int(self.daily_units * BACKGROUND_RESERVE),
+            },
+            'this_worker': stats,
+        }
+
+
+youtube = QuotaLedger('youtube', YOUTUBE_DAILY_UNITS, {'search': 100, 'channels': 1, 'videos': 1})
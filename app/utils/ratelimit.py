@@ -0,0 +1,58 @@
+"""The one Flask-Limiter instance for flask_app and its blueprints.
+
+Counters live in a backend shared by every gunicorn worker, so `-w N` does
+not multiply the limits: Redis when REDIS_URL (or RATELIMIT_STORAGE_URI) is
+set, otherwise a counter table in a memory-mapped file that all workers on
+the host open. Either way a check is one atomic increment (a Lua script on
+Redis, one locked slot update in the shared table).
+
+Requests carrying a valid bearer token are limited per user; anonymous ones
+per remote address.
+"""
+import os
+import jwt
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from app.auth import auth_bp, bearer_token, decode_token
+from app.security import RateLimitConfig
+# The shm:// limits storage; importing it registers the scheme
+from app.utils import shm_storage
+from app.utils.shm_storage import SharedMemoryStorage  # noqa: F401
+
+ENABLED = os.getenv('RATELIMIT_ENABLED', 'true').lower() == 'true'
+
+
+def storage_uri() -> str:
+    return shm_storage.storage_uri(os.getenv('RATELIMIT_STORAGE_URI'), os.getenv('RATELIMIT_SHM_PATH', ''))
+
+def user_or_address() -> str:
+    """Rate-limit key: the authenticated user when the bearer token verifies,
+    else the client address (so a forged token cannot spend someone else's quota)."""
+    token = bearer_token()
+    if token:
+        try:
+            user = decode_token(token)
+        except jwt.InvalidTokenError:
+            user = None
+        if user:
+            return f"user:{user}"
+    return f"ip:{get_remote_address()}"
+
+def limit(name: str):
+    """Decorator applying the RateLimitConfig entry `name`."""
+    return limiter.limit(RateLimitConfig.LIMITS[name])
+
+
+limiter = Limiter(
+    key_func=user_or_address,
+    default_limits=[RateLimitConfig.LIMITS['default']],
+    storage_uri=storage_uri(),
+    strategy='fixed-window',
+    key_prefix=os.getenv('CACHE_KEY_PREFIX', 'si'),
+    # Keep limiting per worker if Redis goes away rather than failing requests
+    in_memory_fallback_enabled=True,
+    swallow_errors=True,
+    enabled=ENABLED,
+)
+# Applied here rather than in create_app so it is registered exactly once
+limiter.limit(RateLimitConfig.LIMITS['login'])(auth_bp)
@@ -0,0 +1,142 @@
+import os
+import time
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from app.utils import quota
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_ENABLED = os.getenv('REFRESH_SCHEDULER_ENABLED', 'true').lower() == 'true'
+TOP_N = int(os.getenv('REFRESH_TOP_N', 20))
+INTERVAL = float(os.getenv('REFRESH_INTERVAL', 5))
+# Refresh hot keys this many seconds before they go stale
+AHEAD = float(os.getenv('REFRESH_AHEAD', 10))
+CONCURRENCY = int(os.getenv('REFRESH_CONCURRENCY', 2))
+RATE = float(os.getenv('REFRESH_RATE', 2))  # upstream refreshes per second
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class RefreshScheduler:
+    """Runs background cache refreshes with bounded concurrency and rate.
+
+    Serves two callers: stale-while-revalidate reads hand over a single
+    refresh for the key they just served stale, and a periodic loop
+    re-fetches the top-N most requested keys shortly before they go stale.
+    """
+
+    def __init__(self, fresh_remaining, top_n: int = TOP_N, interval: float = INTERVAL,
+                 ahead: float = AHEAD, concurrency: int = CONCURRENCY, rate: float = RATE,
+                 enabled: bool = SCHEDULER_ENABLED):
+        # fresh_remaining(key) -> seconds until the key goes stale, or None if absent
+        self.fresh_remaining = fresh_remaining
+        self.top_n = top_n
+        self.interval = interval
+        self.ahead = ahead
+        self.concurrency = concurrency
+        self.enabled = enabled
+        self._bucket = TokenBucket(rate)
+        self._executor = None
+        self._hits = Counter()
+        self._jobs = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'rate_limited': 0, 'scheduled': 0}
+
+    def track(self, key: str, refresh):
+        """Record a read of `key`; `refresh` re-fetches and stores it."""
+        with self._lock:
+            self._hits[key] += 1
+            self._jobs[key] = refresh
+            start = self.enabled and self._thread is None
+            if start:
+                # Started lazily so the thread lives in the worker, not a pre-fork parent
+                self._thread = threading.Thread(target=self._loop, name='cache-refresh', daemon=True)
+        if start:
+            self._thread.start()
+
+    def submit(self, key: str, refresh) -> bool:
+        with self._lock:
+            if key in self._pending:
+                return False
+            if not self._bucket.take():
+                self._stats['rate_limited'] += 1
+                return False
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='refresh')
+            self._pending.add(key)
+            self._stats['submitted'] += 1
+        self._executor.submit(self._run, key, refresh)
+        return True
+
+    def take_token(self) -> bool:
+        """Rate check for refreshes run as asyncio tasks instead of on the executor."""
+        with self._lock:
+            if not self._bucket.take():
+                self._stats['rate_limited'] += 1
+                return False
+            self._stats['submitted'] += 1
+            return True
+
+    def _run(self, key: str, refresh):
+        try:
+            # Refreshes are the first thing to give up when upstream quota runs low
+            with quota.background():
+                refresh()
+            outcome = 'completed'
+        except Exception as e:
+            logger.error(f"Background refresh failed for {key}: {str(e)}")
+            outcome = 'failed'
+        with self._lock:
+            self._pending.discard(key)
+            self._stats[outcome] += 1
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Refresh scheduler error: {str(e)}")
+
+    def tick(self):
+        with self._lock:
+            hot = [key for key, _ in self._hits.most_common(self.top_n)]
+            jobs = {key: self._jobs[key] for key in hot}
+            # Decay so keys that stop being requested fall out of the top N
+            for key in list(self._hits):
+                self._hits[key] //= 2
+                if not self._hits[key]:
+                    del self._hits[key]
+                    self._jobs.pop(key, None)
+        for key, refresh in jobs.items():
+            remaining = self.fresh_remaining(key)
+            if remaining is not None and remaining <= self.ahead:
+                if self.submit(key, refresh):
+                    with self._lock:
+                        self._stats['scheduled'] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, tracked_keys=len(self._hits), pending=len(self._pending),
+                        scheduler_running=self._thread is not None)
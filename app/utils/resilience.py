@@ -0,0 +1,174 @@
+import os
+import time
+import threading
+import requests
+from app.utils import metrics
+
+FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 5))
+RESET_TIMEOUT = float(os.getenv('BREAKER_RESET_TIMEOUT', 30))
+HALF_OPEN_PROBES = int(os.getenv('BREAKER_HALF_OPEN_PROBES', 1))
+LIMIT_INITIAL = int(os.getenv('LIMITER_INITIAL', 20))
+LIMIT_MIN = int(os.getenv('LIMITER_MIN', 2))
+LIMIT_MAX = int(os.getenv('LIMITER_MAX', 64))
+# Calls slower than this count as congestion and shrink the limit
+TARGET_LATENCY = float(os.getenv('LIMITER_TARGET_LATENCY', 2.0))
+
+
+class UpstreamUnavailable(requests.RequestException):
+    """Raised before any network I/O when an upstream is shedding load.
+    Subclasses RequestException so wrappers handle it like any other
+    upstream failure."""
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    pass
+
+
+class ConcurrencyLimitExceeded(UpstreamUnavailable):
+    pass
+
+
+class CircuitBreaker:
+    """Closed -> open after FAILURE_THRESHOLD consecutive failures; after
+    RESET_TIMEOUT a limited number of half-open probes decide whether to
+    close again or re-open."""
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT,
+                 half_open_probes: int = HALF_OPEN_PROBES):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probes = 0
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self.probes = 0
+            if self.state == self.HALF_OPEN:
+                if self.probes >= self.half_open_probes:
+                    return False
+                self.probes += 1
+            return True
+
+    def record(self, ok: bool):
+        with self._lock:
+            if ok:
+                self.state = self.CLOSED
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            retry_in = None
+            if self.state == self.OPEN:
+                retry_in = round(max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at)), 2)
+            return {'state': self.state, 'consecutive_failures': self.failures, 'trips': self.trips,
+                    'retry_in_seconds': retry_in}
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit: grows by roughly one per window of fast,
+    successful calls and halves on failure or when latency exceeds the
+    target. Callers over the limit are rejected instead of queued, so a
+    slow upstream cannot tie up every worker thread."""
+
+    def __init__(self, initial: int = LIMIT_INITIAL, minimum: int = LIMIT_MIN, maximum: int = LIMIT_MAX,
+                 target_latency: float = TARGET_LATENCY):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self.rejected = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def cancel(self):
+        """Give back a slot without feeding the call into the limit."""
+        with self._lock:
+            self.in_flight -= 1
+
+    def release(self, ok: bool, latency: float):
+        with self._lock:
+            self.in_flight -= 1
+            if ok and latency <= self.target_latency:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                return
+            now = time.monotonic()
+            # Back off at most once per target-latency window so one burst of slow calls halves the limit once
+            if now - self._last_decrease >= self.target_latency:
+                self.limit = max(self.minimum, self.limit / 2)
+                self._last_decrease = now
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {'limit': int(self.limit), 'in_flight': self.in_flight, 'rejected': self.rejected}
+
+
+class UpstreamGuard:
+    def __init__(self, host: str):
+        self.host = host
+        self.breaker = CircuitBreaker()
+        self.limiter = AdaptiveLimiter()
+
+    def enter(self):
+        """Raise UpstreamUnavailable instead of calling an unhealthy upstream."""
+        if not self.limiter.acquire():
+            metrics.upstream_rejected(self.host, 'concurrency_limit')
+            raise ConcurrencyLimitExceeded(f"Concurrency limit reached for {self.host}")
+        if not self.breaker.allow():
+            self.limiter.cancel()
+            metrics.upstream_rejected(self.host, 'circuit_open')
+            raise CircuitOpenError(f"Circuit open for {self.host}")
+        return time.monotonic()
+
+    def exit(self, started: float, ok: bool):
+        self.limiter.release(ok, time.monotonic() - started)
+        self.breaker.record(ok)
+
+    def snapshot(self) -> dict:
+        return {'breaker': self.breaker.snapshot(), 'limiter': self.limiter.snapshot()}
+
+
+_guards = {}
+_lock = threading.Lock()
+
+def guard(host: str) -> UpstreamGuard:
+    upstream = _guards.get(host)
+    if upstream is None:
+        with _lock:
+            upstream = _guards.setdefault(host, UpstreamGuard(host))
+    return upstream
+
+def healthy_status(status: int) -> bool:
+    """4xx other than 429 are the caller's problem, not the upstream's."""
+    return status < 500 and status != 429
+
+def snapshot() -> dict:
+    with _lock:
+        guards = dict(_guards)
+    return {host: upstream.snapshot() for host, upstream in guards.items()}
@@ -0,0 +1,152 @@
+"""JSON response pipeline for the Flask routes: fast encoding, strong
+ETags with 304s, and gzip/brotli compression.
+
+Cached wrapper results come back from the local LRU as the same object on
+every hit, so the encoded body, its ETag and any compressed variants are
+memoized by object identity and reused until that object leaves the cache.
+"""
+import os
+import gzip
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import Response, request
+from app.utils import timing
+from app.utils.cache import json_default
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.getenv('RESPONSE_GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.getenv('RESPONSE_BROTLI_QUALITY', 5))
+ENCODED_MAX_ENTRIES = int(os.getenv('RESPONSE_ENCODED_MAX_ENTRIES', 256))
+
+MIMETYPE = 'application/json'
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+
+
+def _default(value):
+    try:
+        return json_default(value)
+    except TypeError:
+        return str(value)
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode()
+
+
+class EncodedBody:
+    """One serialized payload plus its lazily built compressed variants."""
+
+    __slots__ = ('body', 'digest', 'variants')
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.digest = hashlib.sha1(body).hexdigest()
+        self.variants = {}
+
+    def etag(self, encoding: str = None) -> str:
+        # Strong ETags must differ per content-coding
+        return f"{self.digest}-{encoding}" if encoding else self.digest
+
+    def etags(self):
+        return [self.etag()] + [self.etag(encoding) for encoding in ENCODINGS]
+
+    def encoded(self, encoding: str) -> bytes:
+        data = self.variants.get(encoding)
+        if data is None:
+            if encoding == 'br':
+                data = brotli.compress(self.body, quality=BROTLI_QUALITY)
+            else:
+                data = gzip.compress(self.body, compresslevel=GZIP_LEVEL, mtime=0)
+            self.variants[encoding] = data
+        return data
+
+
+class _EncodedCache:
+    """Bounded identity map from payload objects to their EncodedBody. The
+    entry holds a reference to the object, so its id cannot be reused while
+    the entry lives."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, obj) -> EncodedBody:
+        key = id(obj)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] is obj:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        encoded = EncodedBody(dumps(obj))
+        with self._lock:
+            self._data[key] = (obj, encoded)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return encoded
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._data), 'hits': self.hits, 'misses': self.misses}
+
+
+_encoded = _EncodedCache(ENCODED_MAX_ENTRIES)
+
+
+def _negotiate(size: int):
+    if size < COMPRESS_MIN_BYTES:
+        return None
+    return request.accept_encodings.best_match(ENCODINGS)
+
+def json_response(data, status: int = 200, reuse: bool = True) -> Response:
+    """Serialize `data` for the current request. Successful responses get a
+    strong ETag and answer a matching If-None-Match with 304; bodies over
+    COMPRESS_MIN_BYTES are compressed when the client accepts it.
+
+    With `reuse`, the encoding is memoized by the identity of `data`, so it
+    must be treated as immutable (as cached wrapper results are). Pass
+    reuse=False for payloads built per request.
+    """
+    if status != 200:
+        with timing.phase('serialize'):
+            return Response(dumps(data), status=status, mimetype=MIMETYPE)
+    with timing.phase('serialize'):
+        encoded = _encoded.get(data) if reuse else EncodedBody(dumps(data))
+    encoding = _negotiate(len(encoded.body))
+    if request.if_none_match:
+        matched = [tag for tag in encoded.etags() if tag in request.if_none_match]
+        if matched:
+            # Echo the tag the client holds; prefer the variant it would get now
+            preferred = encoded.etag(encoding)
+            response = Response(status=304)
+            response.set_etag(preferred if preferred in matched else matched[0])
+            response.vary.add('Accept-Encoding')
+            return response
+    with timing.phase('compress'):
+        body = encoded.encoded(encoding) if encoding else encoded.body
+    response = Response(body, mimetype=MIMETYPE)
+    if encoding:
+        response.content_encoding = encoding
+    response.set_etag(encoded.etag(encoding))
+    response.vary.add('Accept-Encoding')
+    return response
+
+def stats() -> dict:
+    return {'encoder': 'orjson' if orjson else 'json', 'encodings': list(ENCODINGS),
+            'encoded_cache': _encoded.stats()}
@@ -0,0 +1,149 @@
+"""Fixed-window counters in a memory-mapped file, as a `limits` storage.
+
+Registers the shm:// scheme with `limits`, so storage_from_string can open
+it. Both the Flask rate limiter and the quota ledger use it as their
+host-wide fallback when Redis is not configured. Kept apart from
+app.utils.ratelimit so the async service can use it without importing
+Flask.
+"""
+import os
+import mmap
+import time
+import struct
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from limits.storage import Storage
+try:
+    import fcntl
+except ImportError:  # not on Windows; the table is then only shared between threads
+    fcntl = None
+try:
+    import redis
+except ImportError:  # optional dependency
+    redis = None
+
+SHM_SLOTS = int(os.getenv('RATELIMIT_SHM_SLOTS', 8192))
+_DEFAULT_SHM_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+class SharedMemoryStorage(Storage):
+    """Fixed-window counters in a file-backed shared mapping (shm:///path).
+
+    Each key hashes to a 24-byte slot (tag, window expiry, count); collisions
+    probe a few neighbours and otherwise take the slot closest to expiry.
+    Updates hold a process lock plus an flock on the file, so concurrent
+    workers see one consistent count.
+    """
+
+    STORAGE_SCHEME = ['shm']
+    SLOT = struct.Struct('<Qdq')
+    PROBES = 8
+
+    def __init__(self, uri: str = None, wrap_exceptions: bool = False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        path = urlsplit(uri).path if uri else ''
+        self.path = path or os.path.join(_DEFAULT_SHM_DIR, 'social-insights-ratelimit')
+        self.slots = int(options.get('slots', SHM_SLOTS))
+        self._lock = threading.Lock()
+        self._pid = None
+        self._fd = None
+        self._map = None
+
+    @property
+    def base_exceptions(self):
+        return OSError
+
+    def _mapping(self):
+        # Reopen after fork: an inherited descriptor shares its flock with the parent
+        if self._pid != os.getpid():
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            size = self.slots * self.SLOT.size
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._fd, self._map, self._pid = fd, mmap.mmap(fd, size), os.getpid()
+        return self._map
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            mapping = self._mapping()
+            if fcntl:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield mapping
+            finally:
+                if fcntl:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _tag(key: str) -> int:
+        # 0 marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+
+    def _find(self, mapping, tag: int, now: float):
+        """Return (offset, expires, count) of the slot for `tag`, claiming a
+        free or expired one (count 0) when the key has none."""
+        start = tag % self.slots
+        free = oldest = None
+        for probe in range(self.PROBES):
+            offset = ((start + probe) % self.slots) * self.SLOT.size
+            slot_tag, expires, count = self.SLOT.unpack_from(mapping, offset)
+            if slot_tag == tag:
+                return offset, expires, count if expires > now else 0
+            if free is None and (slot_tag == 0 or expires <= now):
+                free = offset
+            if oldest is None or expires < oldest[1]:
+                oldest = (offset, expires)
+        return (free if free is not None else oldest[0]), 0.0, 0
+
+    def incr(self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1) -> int:
+        tag = self._tag(key)
+        now = time.time()
+        with self._locked() as mapping:
+            offset, expires, count = self._find(mapping, tag, now)
+            if count == 0 or elastic_expiry:
+                expires = now + expiry
+            count += amount
+            self.SLOT.pack_into(mapping, offset, tag, expires, count)
+        return count
+
+    def get(self, key: str) -> int:
+        with self._locked() as mapping:
+            return self._find(mapping, self._tag(key), time.time())[2]
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        with self._locked() as mapping:
+            _, expires, count = self._find(mapping, self._tag(key), now)
+        return expires if count else now
+
+    def check(self) -> bool:
+        try:
+            self._mapping()
+            return True
+        except OSError:
+            return False
+
+    def reset(self):
+        with self._locked() as mapping:
+            mapping[:] = bytes(len(mapping))
+
+    def clear(self, key: str):
+        tag = self._tag(key)
+        with self._locked() as mapping:
+            offset, _, count = self._find(mapping, tag, time.time())
+            if count:
+                self.SLOT.pack_into(mapping, offset, 0, 0.0, 0)
+
+
+def storage_uri(explicit: str = None, shm_path: str = '') -> str:
+    """`explicit` when set, else REDIS_URL (when redis-py is installed), else
+    a shared-memory table at `shm_path` (the storage's default when empty)."""
+    if explicit:
+        return explicit
+    if redis and os.getenv('REDIS_URL'):
+        return os.getenv('REDIS_URL')
+    return f"shm://{shm_path}"
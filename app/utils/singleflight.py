@@ -0,0 +1,132 @@
+import time
+import uuid
+import asyncio
+import threading
+
+# Compare-and-delete so a worker never releases a lease another worker now holds
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class _Call:
+    __slots__ = ('event', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one execution.
+
+    The first caller for a key runs `fn`; callers arriving while it is in
+    flight block and receive the same result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key: str, fn):
+        """Return (result, shared) where shared is True for followers."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """asyncio counterpart of SingleFlight for coroutine callers.
+
+    The shared fetch runs as its own task, so a caller that is cancelled
+    (for example by a timeout) does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def do(self, key: str, fn):
+        task = self._tasks.get(key)
+        if task is not None:
+            return await asyncio.shield(task), True
+        task = self._tasks[key] = asyncio.ensure_future(fn())
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return await asyncio.shield(task), False
+
+    def running(self, key: str) -> bool:
+        return key in self._tasks
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+
+class RedisLease:
+    """Short-lived Redis lock used to elect one worker per key."""
+
+    def __init__(self, client, ttl: float = 15.0, prefix: str = 'lease'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def acquire(self, key: str):
+        token = uuid.uuid4().hex
+        try:
+            if self.client.set(f"{self.prefix}:{key}", token, nx=True, px=int(self.ttl * 1000)):
+                return token
+        except Exception:
+            # Redis trouble must not block the fetch; act as if we own it
+            return token
+        return None
+
+    def release(self, key: str, token: str):
+        try:
+            self.client.eval(_RELEASE_SCRIPT, 1, f"{self.prefix}:{key}", token)
+        except Exception:
+            pass
+
+    def held(self, key: str) -> bool:
+        """Whether anyone still holds the lease (False when Redis is unreachable)."""
+        try:
+            return bool(self.client.exists(f"{self.prefix}:{key}"))
+        except Exception:
+            return False
+
+    def wait_for(self, poll, timeout: float, interval: float = 0.05):
+        """Poll until `poll()` returns a value or the lease would have expired."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            value = poll()
+            if value is not None:
+                return value
+            time.sleep(interval)
+        return None
@@ -0,0 +1,316 @@
+"""Local time series of Reddit post and YouTube channel statistics.
+
+Wrappers hand every upstream result to `record_posts` / `record_channels`,
+which only enqueue; a single writer thread per process applies the batches
+to an SQLite database in WAL mode, so readers never block on it and several
+gunicorn workers can share one file.
+
+Ingestion is incremental and deduplicated by post/channel ID: the latest
+values live on the entity row, and a new snapshot row is only written when
+they changed or SNAPSHOT_MIN_INTERVAL seconds have passed since the last
+one. The compare-and-write runs inside one IMMEDIATE transaction so
+concurrent workers do not double-record.
+"""
+import os
+import time
+import queue
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv('SNAPSHOTS_ENABLED', 'true').lower() == 'true'
+DB_PATH = os.getenv('SNAPSHOT_DB_PATH', 'snapshots.sqlite3')
+MIN_INTERVAL = int(os.getenv('SNAPSHOT_MIN_INTERVAL', 300))
+QUEUE_SIZE = int(os.getenv('SNAPSHOT_QUEUE_SIZE', 1000))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reddit_posts (
+    post_id TEXT PRIMARY KEY,
+    subreddit TEXT NOT NULL,
+    title TEXT,
+    author TEXT,
+    url TEXT,
+    created_utc REAL,
+    score INTEGER,
+    comments INTEGER,
+    first_seen INTEGER NOT NULL,
+    last_snapshot INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reddit_posts_subreddit ON reddit_posts (subreddit, last_snapshot);
+CREATE TABLE IF NOT EXISTS reddit_post_snapshots (
+    post_id TEXT NOT NULL,
+    observed_at INTEGER NOT NULL,
+    score INTEGER,
+    comments INTEGER,
+    PRIMARY KEY (post_id, observed_at)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS youtube_channels (
+    channel_id TEXT PRIMARY KEY,
+    channel_name TEXT,
+    subscribers INTEGER,
+    total_views INTEGER,
+    total_videos INTEGER,
+    first_seen INTEGER NOT NULL,
+    last_snapshot INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS youtube_channel_snapshots (
+    channel_id TEXT NOT NULL,
+    observed_at INTEGER NOT NULL,
+    subscribers INTEGER,
+    total_views INTEGER,
+    total_videos INTEGER,
+    PRIMARY KEY (channel_id, observed_at)
+) WITHOUT ROWID;
+"""
+
+
+def _int(value):
+    return int(value) if value is not None else None
+
+
+class SnapshotStore:
+    def __init__(self, path: str = DB_PATH, min_interval: int = MIN_INTERVAL, queue_size: int = QUEUE_SIZE,
+                 enabled: bool = ENABLED):
+        self.path = path
+        self.min_interval = min_interval
+        self.enabled = enabled
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writer_pid = None
+        self._schema_ready = False
+        self._stats = {'batches': 0, 'snapshots': 0, 'deduplicated': 0, 'dropped': 0, 'failed': 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread (and per process: thread-locals do not survive fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.row_factory = sqlite3.Row
+            if not self._schema_ready:
+                conn.executescript(SCHEMA)
+                self._schema_ready = True
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    # Ingestion
+
+    def _enqueue(self, kind: str, scope, items: list):
+        if not self.enabled or not items:
+            return
+        with self._lock:
+            if self._writer_pid != os.getpid():
+                # Started lazily so the thread lives in the worker, not a pre-fork parent
+                self._writer_pid = os.getpid()
+                threading.Thread(target=self._drain, name='snapshot-writer', daemon=True).start()
+        try:
+            self._queue.put_nowait((kind, scope, items, int(time.time())))
+        except queue.Full:
+            with self._lock:
+                self._stats['dropped'] += 1
+
+    def record_posts(self, subreddit: str, posts: list):
+        """Queue a listing's posts (as returned by RedditWrapper._parse_post)."""
+        self._enqueue('posts', subreddit.lower(), [post for post in posts if post.get('id')])
+
+    def record_channels(self, records: dict):
+        """Queue channel records keyed by channel ID (YouTubeWrapper._channel_record shape)."""
+        self._enqueue('channels', None, list(records.items()))
+
+    def _drain(self):
+        while True:
+            kind, scope, items, observed_at = self._queue.get()
+            try:
+                if kind == 'posts':
+                    written = self._write_posts(scope, items, observed_at)
+                else:
+                    written = self._write_channels(items, observed_at)
+                outcome = {'batches': 1, 'snapshots': written, 'deduplicated': len(items) - written}
+            except sqlite3.Error as e:
+                logger.error(f"Snapshot write failed: {str(e)}")
+                outcome = {'failed': 1}
+            with self._lock:
+                for name, count in outcome.items():
+                    self._stats[name] += count
+            self._queue.task_done()
+
+    def _due(self, previous, values: tuple, observed_at: int, fields: tuple) -> bool:
+        if previous is None:
+            return True
+        changed = tuple(previous[field] for field in fields) != values
+        return changed or observed_at - previous['last_snapshot'] >= self.min_interval
+
+    def _write_posts(self, subreddit: str, posts: list, observed_at: int) -> int:
+        conn = self._connect()
+        ids = [post['id'] for post in posts]
+        written = 0
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            placeholders = ','.join('?' * len(ids))
+            known = {row['post_id']: row for row in conn.execute(
+                f'SELECT post_id, score, comments, last_snapshot FROM reddit_posts WHERE post_id IN ({placeholders})',
+                ids)}
+            for post in posts:
+                values = (_int(post.get('score')), _int(post.get('comments')))
+                if not self._due(known.get(post['id']), values, observed_at, ('score', 'comments')):
+                    continue
+                # A post keeps its home subreddit when seen again through r/all or r/popular
+                conn.execute(
+                    'INSERT INTO reddit_posts (post_id, subreddit, title, author, url, created_utc, score, comments,'
+                    ' first_seen, last_snapshot) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+                    ' ON CONFLICT (post_id) DO UPDATE SET title = excluded.title, score = excluded.score,'
+                    " subreddit = CASE WHEN excluded.subreddit IN ('all', 'popular') THEN subreddit"
+                    ' ELSE excluded.subreddit END,'
+                    ' comments = excluded.comments, last_snapshot = excluded.last_snapshot',
+                    (post['id'], subreddit, post.get('title'), post.get('author'), post.get('url'),
+                     post.get('created'), *values, observed_at, observed_at))
+                conn.execute('INSERT OR IGNORE INTO reddit_post_snapshots VALUES (?, ?, ?, ?)',
+                             (post['id'], observed_at, *values))
+                written += 1
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            conn.execute('ROLLBACK')
+            raise
+        return written
+
+    def _write_channels(self, records: list, observed_at: int) -> int:
+        conn = self._connect()
+        ids = [channel_id for channel_id, _ in records]
+        written = 0
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            placeholders = ','.join('?' * len(ids))
+            known = {row['channel_id']: row for row in conn.execute(
+                'SELECT channel_id, subscribers, total_views, total_videos, last_snapshot FROM youtube_channels'
+                f' WHERE channel_id IN ({placeholders})', ids)}
+            fields = ('subscribers', 'total_views', 'total_videos')
+            for channel_id, record in records:
+                values = tuple(_int(record.get(field)) for field in fields)
+                if not self._due(known.get(channel_id), values, observed_at, fields):
+                    continue
+                conn.execute(
+                    'INSERT INTO youtube_channels (channel_id, channel_name, subscribers, total_views, total_videos,'
+                    ' first_seen, last_snapshot) VALUES (?, ?, ?, ?, ?, ?, ?)'
+                    ' ON CONFLICT (channel_id) DO UPDATE SET channel_name = excluded.channel_name,'
+                    ' subscribers = excluded.subscribers, total_views = excluded.total_views,'
+                    ' total_videos = excluded.total_videos, last_snapshot = excluded.last_snapshot',
+                    (channel_id, record.get('channel_name'), *values, observed_at, observed_at))
+                conn.execute('INSERT OR IGNORE INTO youtube_channel_snapshots VALUES (?, ?, ?, ?, ?)',
+                             (channel_id, observed_at, *values))
+                written += 1
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            conn.execute('ROLLBACK')
+            raise
+        return written
+
+    def flush(self, timeout: float = 5.0):
+        """Wait until queued batches are written (for scripts and shutdown)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    # Queries
+
+    @staticmethod
+    def _rate(delta, seconds: int, per: int):
+        if delta is None or seconds <= 0:
+            return None
+        return round(delta * per / seconds, 2)
+
+    def post_history(self, post_id: str, since: int) -> dict:
+        conn = self._connect()
+        post = conn.execute('SELECT * FROM reddit_posts WHERE post_id = ?', (post_id,)).fetchone()
+        if post is None:
+            return None
+        rows = conn.execute(
+            'SELECT observed_at, score, comments FROM reddit_post_snapshots'
+            ' WHERE post_id = ? AND observed_at >= ? ORDER BY observed_at', (post_id, since)).fetchall()
+        return {
+            'post_id': post_id,
+            'subreddit': post['subreddit'],
+            'title': post['title'],
+            'snapshots': [dict(row) for row in rows],
+            **self._post_growth(rows),
+        }
+
+    def _post_growth(self, rows) -> dict:
+        if len(rows) < 2:
+            return {'score_delta': None, 'comments_delta': None, 'score_per_hour': None, 'comments_per_hour': None}
+        first, last = rows[0], rows[-1]
+        seconds = last['observed_at'] - first['observed_at']
+        score_delta = None if None in (first['score'], last['score']) else last['score'] - first['score']
+        comments_delta = None if None in (first['comments'], last['comments']) else last['comments'] - first['comments']
+        return {
+            'score_delta': score_delta,
+            'comments_delta': comments_delta,
+            'score_per_hour': self._rate(score_delta, seconds, 3600),
+            'comments_per_hour': self._rate(comments_delta, seconds, 3600),
+        }
+
+    def subreddit_velocity(self, subreddit: str, since: int, limit: int) -> list:
+        """Posts seen in the window, fastest-rising score first."""
+        conn = self._connect()
+        rows = conn.execute(
+            'SELECT p.post_id, p.title, s.observed_at, s.score, s.comments'
+            ' FROM reddit_posts p JOIN reddit_post_snapshots s ON s.post_id = p.post_id'
+            ' WHERE p.subreddit = ? AND p.last_snapshot >= ? AND s.observed_at >= ?'
+            ' ORDER BY p.post_id, s.observed_at', (subreddit.lower(), since, since)).fetchall()
+        posts = []
+        start = 0
+        for index in range(1, len(rows) + 1):
+            if index == len(rows) or rows[index]['post_id'] != rows[start]['post_id']:
+                series = rows[start:index]
+                posts.append(dict(post_id=series[0]['post_id'], title=series[0]['title'],
+                                  score=series[-1]['score'], comments=series[-1]['comments'],
+                                  snapshots=len(series), **self._post_growth(series)))
+                start = index
+        posts.sort(key=lambda post: post['score_per_hour'] if post['score_per_hour'] is not None else float('-inf'),
+                   reverse=True)
+        return posts[:limit]
+
+    def channel_history(self, channel_id: str, since: int) -> dict:
+        conn = self._connect()
+        channel = conn.execute('SELECT * FROM youtube_channels WHERE channel_id = ?', (channel_id,)).fetchone()
+        if channel is None:
+            return None
+        rows = conn.execute(
+            'SELECT observed_at, subscribers, total_views, total_videos FROM youtube_channel_snapshots'
+            ' WHERE channel_id = ? AND observed_at >= ? ORDER BY observed_at', (channel_id, since)).fetchall()
+        growth = {'subscriber_delta': None, 'views_delta': None, 'videos_delta': None,
+                  'subscribers_per_day': None, 'views_per_day': None}
+        if len(rows) >= 2:
+            first, last = rows[0], rows[-1]
+            seconds = last['observed_at'] - first['observed_at']
+            deltas = {field: None if None in (first[field], last[field]) else last[field] - first[field]
+                      for field in ('subscribers', 'total_views', 'total_videos')}
+            growth = {
+                'subscriber_delta': deltas['subscribers'],
+                'views_delta': deltas['total_views'],
+                'videos_delta': deltas['total_videos'],
+                'subscribers_per_day': self._rate(deltas['subscribers'], seconds, 86400),
+                'views_per_day': self._rate(deltas['total_views'], seconds, 86400),
+            }
+        return {
+            'channel_id': channel_id,
+            'channel_name': channel['channel_name'],
+            'snapshots': [dict(row) for row in rows],
+            **growth,
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, queued=self._queue.qsize(), enabled=self.enabled, path=self.path)
+
+
+store = SnapshotStore()
+
+def record_posts(subreddit: str, posts: list):
+    store.record_posts(subreddit, posts)
+
+def record_channels(records: dict):
+    store.record_channels(records)
@@ -0,0 +1,70 @@
+"""Per-request phase timers, reported in a Server-Timing response header.
+
+The services start a `Timings` for each request; code anywhere below wraps
+its work in `phase(name)`. Phases with the same name add up (a batch of
+channels.list calls shows as one entry with a count). Outside a timed
+request `phase` costs one context variable lookup, so wrappers can be
+instrumented unconditionally.
+
+Timings live in a context variable: asyncio tasks started during the
+request share them. Threads of an executor do not, so work fanned out to a
+pool is only visible through the phase wrapped around the wait.
+"""
+import os
+import time
+import contextvars
+from contextlib import contextmanager
+
+ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'true').lower() == 'true'
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class Timings:
+    __slots__ = ('started', 'phases')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+
+    def add(self, name: str, seconds: float):
+        total, count = self.phases.get(name, (0.0, 0))
+        self.phases[name] = (total + seconds, count + 1)
+
+    def header(self) -> str:
+        """Server-Timing value: one metric per phase plus `total`, in ms."""
+        parts = []
+        for name, (total, count) in self.phases.items():
+            part = f"{name};dur={total * 1000:.2f}"
+            if count > 1:
+                part += f';desc="x{count}"'
+            parts.append(part)
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.2f}")
+        return ', '.join(parts)
+
+
+def start():
+    """Begin timing the current request; returns a token for `finish`."""
+    if not ENABLED:
+        return None
+    return _current.set(Timings())
+
+def finish(token) -> str:
+    """Stop timing and return the Server-Timing header value (None when disabled)."""
+    if token is None:
+        return None
+    timings = _current.get()
+    _current.reset(token)
+    return timings.header() if timings is not None else None
+
+@contextmanager
+def phase(name: str):
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
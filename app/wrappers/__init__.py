@@ -1,5 +1,31 @@
-from .reddit_wrapper import RedditWrapper
-from .youtube_wrapper import YouTubeWrapper
-from .linkedin_wrapper import LinkedInWrapper
+"""Platform wrappers, imported on first attribute access.
 
-__all__ = ['RedditWrapper', 'YouTubeWrapper', 'LinkedInWrapper']
+The sync wrappers pull in requests and the async ones httpx; loading them
+lazily means each service only pays for the set it actually uses. Call
+`load_all()` to import everything up front, e.g. in a pre-forking parent.
+"""
+import importlib
+
+_MODULES = {
+    'RedditWrapper': '.reddit_wrapper',
+    'YouTubeWrapper': '.youtube_wrapper',
+    'LinkedInWrapper': '.linkedin_wrapper',
+    'AsyncRedditWrapper': '.async_wrappers',
+    'AsyncYouTubeWrapper': '.async_wrappers',
+    'AsyncLinkedInWrapper': '.async_wrappers',
+}
+
+__all__ = list(_MODULES)
+
+
+def __getattr__(name: str):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+def load_all():
+    for name in _MODULES:
+        __getattr__(name)
@@ -0,0 +1,170 @@
+"""asyncio versions of the platform wrappers for the FastAPI service.
+
+They build requests and parse responses with the sync wrappers' helpers and
+cache under the same namespaces, so results are identical and shared.
+"""
+import httpx
+import asyncio
+import logging
+from app.utils import http_pool, quota, snapshots, timing
+from app.utils.cache import cached, offload
+from app.utils.metrics import timed
+from app.utils.resilience import UpstreamUnavailable
+from .reddit_wrapper import RedditWrapper, _classify_posts
+from .youtube_wrapper import YouTubeWrapper
+from .linkedin_wrapper import LinkedInWrapper
+
+logger = logging.getLogger(__name__)
+
+class AsyncRedditWrapper:
+    @staticmethod
+    @cached('reddit:posts', ttl=RedditWrapper.POSTS_CACHE_TTL, classify=_classify_posts,
+            stale_ttl=RedditWrapper.POSTS_STALE_TTL, negative_ttl=RedditWrapper.NOT_FOUND_CACHE_TTL)
+    @timed('reddit', 'get_subreddit_posts')
+    async def get_subreddit_posts(subreddit: str, limit: int = 10, fields: str = None):
+        try:
+            url = f"{RedditWrapper.BASE_URL}/r/{subreddit}/hot.json"
+            params = {"limit": limit}
+            with timing.phase('reddit.hot'):
+                response = await http_pool.async_get(url, headers=RedditWrapper.HEADERS, params=params, timeout=10)
+            if response.status_code in (403, 404):
+                return RedditWrapper._not_found(subreddit)
+            response.raise_for_status()
+            with timing.phase('reddit.parse'):
+                result = RedditWrapper._parse_posts(subreddit, response.json(), fields)
+            if fields is None:
+                snapshots.record_posts(subreddit, result['posts'])
+            return result
+        except (httpx.HTTPError, UpstreamUnavailable) as e:
+            logger.error(f"Reddit API error: {str(e)}")
+            return RedditWrapper._failed(subreddit)
+
+    @staticmethod
+    @cached('reddit:info', ttl=RedditWrapper.INFO_CACHE_TTL, stale_ttl=RedditWrapper.INFO_STALE_TTL)
+    @timed('reddit', 'get_subreddit_info')
+    async def get_subreddit_info(subreddit: str):
+        try:
+            url = f"{RedditWrapper.BASE_URL}/r/{subreddit}/about.json"
+            response = await http_pool.async_get(url, headers=RedditWrapper.HEADERS, timeout=10)
+            response.raise_for_status()
+            return RedditWrapper._parse_info(response.json())
+        except (httpx.HTTPError, UpstreamUnavailable) as e:
+            logger.error(f"Reddit API error: {str(e)}")
+            return {'error': f'Failed to fetch subreddit info: {str(e)}'}
+
+
+class AsyncYouTubeWrapper:
+    @staticmethod
+    async def _conditional_get(resource: str, params: dict, parse):
+        # The validator and channel stores may be in Redis: keep their calls off the loop
+        key, stored, headers = await offload(YouTubeWrapper._conditional_request, resource, params)
+        with timing.phase(f'youtube.{resource}'):
+            # Off the event loop when the ledger is a Redis round trip
+            charged = await offload(quota.youtube.spend, resource)
+            try:
+                response = await http_pool.async_get(f"{YouTubeWrapper.BASE_URL}/{resource}", params=params,
+                                                     headers=headers, timeout=10)
+            except UpstreamUnavailable:
+                if charged:
+                    await offload(quota.youtube.refund, resource)
+                raise
+        return await offload(YouTubeWrapper._conditional_result, key, stored, response, parse)
+
+    @staticmethod
+    @timed('youtube', 'channels_list')
+    async def _fetch_channel_records(channel_ids: list, fields: str = None):
+        records = await offload(YouTubeWrapper.CHANNEL_STORE.get_many, channel_ids)
+        missing = await offload(YouTubeWrapper._channels_to_fetch, channel_ids, records)
+        errors = {}
+        size = YouTubeWrapper.CHANNELS_PER_REQUEST
+        parse = lambda data: YouTubeWrapper._parse_channel_records(data, fields)  # noqa: E731
+        for start in range(0, len(missing), size):
+            chunk = missing[start:start + size]
+            try:
+                params = YouTubeWrapper._channel_stats_params(','.join(chunk), fields)
+                fetched = await AsyncYouTubeWrapper._conditional_get('channels', params, parse)
+            except (httpx.HTTPError, UpstreamUnavailable) as e:
+                logger.error(f"YouTube API error: {str(e)}")
+                errors.update({channel_id: str(e) for channel_id in chunk})
+                continue
+            await offload(YouTubeWrapper._remember_missing, chunk, fetched)
+            await offload(YouTubeWrapper._store_channel_records, fetched, fields)
+            records.update(fetched)
+        return YouTubeWrapper._project_channel_records(records, fields), errors
+
+    @staticmethod
+    @cached('youtube:channel', ttl=YouTubeWrapper.CHANNEL_CACHE_TTL, stale_ttl=YouTubeWrapper.CHANNEL_STALE_TTL,
+            negative_ttl=YouTubeWrapper.NOT_FOUND_CACHE_TTL)
+    async def get_channel_stats(channel_id: str, fields: str = None):
+        if not YouTubeWrapper.API_KEY:
+            return {'error': 'YouTube API key not configured'}
+        records, errors = await AsyncYouTubeWrapper._fetch_channel_records([channel_id], fields)
+        if channel_id in errors:
+            return {'error': f'Failed to fetch YouTube data: {errors[channel_id]}'}
+        record = records.get(channel_id)
+        if record is None:
+            return YouTubeWrapper._channel_not_found()
+        return record if fields is None else dict(record, channel_id=channel_id)
+
+    @staticmethod
+    @cached('youtube:search', ttl=YouTubeWrapper.SEARCH_CACHE_TTL, stale_ttl=YouTubeWrapper.SEARCH_STALE_TTL)
+    @timed('youtube', 'search_videos')
+    async def search_videos(query: str, max_results: int = 5, fields: str = None):
+        try:
+            if not YouTubeWrapper.API_KEY:
+                return {'error': 'YouTube API key not configured'}
+            params = YouTubeWrapper._video_search_params(query, max_results, fields)
+            return await AsyncYouTubeWrapper._conditional_get(
+                'search', params, lambda data: YouTubeWrapper._parse_videos(query, data, fields))
+        except (httpx.HTTPError, UpstreamUnavailable) as e:
+            logger.error(f"YouTube API error: {str(e)}")
+            return {'error': f'Failed to search videos: {str(e)}'}
+
+    @staticmethod
+    @cached('youtube:channel_search', ttl=YouTubeWrapper.CHANNEL_SEARCH_CACHE_TTL,
+            stale_ttl=YouTubeWrapper.CHANNEL_SEARCH_STALE_TTL)
+    @timed('youtube', 'search_channels')
+    async def search_channels(query: str, max_results: int = 10, sort: str = 'name', order: str = 'desc',
+                              fields: str = None):
+        try:
+            if not YouTubeWrapper.API_KEY:
+                return {'error': 'YouTube API key not configured'}
+            search_params = YouTubeWrapper._search_params(query, max_results, 'channel', YouTubeWrapper.CHANNEL_IDS_MASK)
+            channel_ids = await AsyncYouTubeWrapper._conditional_get(
+                'search', search_params, YouTubeWrapper._parse_channel_ids)
+            if not channel_ids:
+                return {'query': query, 'results_count': 0, 'channels': []}
+
+            records, errors = await AsyncYouTubeWrapper._fetch_channel_records(
+                channel_ids, YouTubeWrapper._channel_search_fields(fields, sort))
+            if errors:
+                return {'error': f'Failed to search channels: {next(iter(errors.values()))}'}
+            channels = [YouTubeWrapper._channel_summary(records[channel_id]) for channel_id in channel_ids if channel_id in records]
+            return YouTubeWrapper._sorted_channels(query, channels, sort, order)
+        except (httpx.HTTPError, UpstreamUnavailable) as e:
+            logger.error(f"YouTube API error: {str(e)}")
+            return {'error': f'Failed to search channels: {str(e)}'}
+
+
+class AsyncLinkedInWrapper:
+    @staticmethod
+    @cached('linkedin:company', ttl=LinkedInWrapper.COMPANY_CACHE_TTL, negative_ttl=LinkedInWrapper.NOT_FOUND_CACHE_TTL)
+    @timed('linkedin', 'get_company_by_name')
+    async def get_company_by_name(linkedin_name: str, fields: str = None):
+        invalid = LinkedInWrapper._check_company_args(linkedin_name)
+        if invalid:
+            return invalid
+        url, headers, params = LinkedInWrapper._company_request(linkedin_name)
+        try:
+            with timing.phase('linkedin.company'):
+                resp = await http_pool.async_get(url, headers=headers, params=params, timeout=15)
+            resp.raise_for_status()
+            with timing.phase('linkedin.parse'):
+                return {
+                    'query': linkedin_name,
+                    'data': LinkedInWrapper._project_company(resp.json(), fields)
+                }
+        except (httpx.HTTPError, UpstreamUnavailable) as e:
+            logger.error(f"LinkedIn RapidAPI error: {str(e)}")
+            status = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+            return {'error': 'Failed to fetch LinkedIn data', 'status': status}
@@ -0,0 +1,59 @@
+"""Sparse fieldsets for wrapper results.
+
+A wrapper declares its output fields as {name: upstream path} (paths use
+'/' between keys, as the YouTube Data API `fields` parameter does). Parsing
+then builds only the selected names, and the same paths give the upstream
+field mask. `fields` arguments are canonical strings (sorted, comma
+separated) so every spelling of a fieldset shares one cache entry.
+"""
+from functools import lru_cache
+
+
+def parse(raw: str, allowed=None):
+    """Canonical fields string from a `fields=` query value, or None for all
+    fields. Raises ValueError naming unknown fields when `allowed` is given."""
+    names = sorted({name.strip() for name in (raw or '').split(',') if name.strip()})
+    if not names:
+        return None
+    if allowed is not None:
+        unknown = [name for name in names if name not in allowed]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)} (allowed: {', '.join(allowed)})")
+    return ','.join(names)
+
+def merge(fields: str, *names) -> str:
+    """`fields` plus names the wrapper itself needs; None stays None."""
+    if fields is None:
+        return None
+    return ','.join(sorted(set(fields.split(',')) | set(names)))
+
+@lru_cache(maxsize=256)
+def _select(paths: tuple, fields: str):
+    wanted = None if fields is None else set(fields.split(','))
+    return tuple((name, tuple(path.split('/'))) for name, path in paths if wanted is None or name in wanted)
+
+def select(paths: dict, fields: str = None):
+    """[(name, key path)] for the requested fields, in declaration order."""
+    return _select(tuple(paths.items()), fields)
+
+def pluck(item: dict, keys: tuple):
+    for key in keys:
+        if not isinstance(item, dict):
+            return None
+        item = item.get(key)
+    return item
+
+def build(item: dict, selected) -> dict:
+    return {name: pluck(item, keys) for name, keys in selected}
+
+def project(record: dict, fields: str = None) -> dict:
+    """Keep only the requested keys of an already built record."""
+    if fields is None or not hasattr(record, 'keys'):
+        return record
+    wanted = fields.split(',')
+    return {name: record[name] for name in wanted if name in record}
+
+def api_mask(selected, container: str = 'items', extra=('etag',)) -> str:
+    """YouTube Data API `fields` value fetching only the selected paths."""
+    inner = ','.join(dict.fromkeys('/'.join(keys) for _, keys in selected))
+    return ','.join([*extra, f"{container}({inner})"])
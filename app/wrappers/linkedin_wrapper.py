@@ -1,33 +1,64 @@
 import os
 import requests
 import logging
+from app.utils import http_pool, timing
+from app.utils.metrics import timed
+from app.utils.cache import NEGATIVE_TTL, cached
+from . import records
 
 logger = logging.getLogger(__name__)
 
 class LinkedInWrapper:
     HOST = os.getenv('LINKEDIN_RAPIDAPI_HOST') or os.getenv('RAPIDAPI_HOST', 'linkedin-api15.p.rapidapi.com')
     KEY = os.getenv('RAPIDAPI_KEY')
+    BASE_URL = os.getenv('LINKEDIN_BASE_URL') or f"https://{HOST}"
+    COMPANY_CACHE_TTL = int(os.getenv('CACHE_TTL_LINKEDIN_COMPANY', 3600))
+    # Unknown companies (a 404 from the API) are remembered this long
+    NOT_FOUND_CACHE_TTL = int(os.getenv('CACHE_NEGATIVE_TTL_LINKEDIN', NEGATIVE_TTL))
 
     @staticmethod
-    def get_company_by_name(linkedin_name: str):
-        if not LinkedInWrapper.KEY:
-            return {'error': 'RAPIDAPI_KEY not configured'}
-        if not linkedin_name:
-            return {'error': 'linkedinName is required'}
-        url = f"https://{LinkedInWrapper.HOST}/v1/companies/get"
+    def _company_request(linkedin_name: str):
+        url = f"{LinkedInWrapper.BASE_URL}/v1/companies/get"
         headers = {
             'x-rapidapi-key': LinkedInWrapper.KEY,
             'x-rapidapi-host': LinkedInWrapper.HOST
         }
         params = { 'linkedinName': linkedin_name }
+        return url, headers, params
+
+    @staticmethod
+    def _check_company_args(linkedin_name: str):
+        if not LinkedInWrapper.KEY:
+            return {'error': 'RAPIDAPI_KEY not configured'}
+        if not linkedin_name:
+            return {'error': 'linkedinName is required'}
+        return None
+
+    @staticmethod
+    def _project_company(data, fields: str = None):
+        """Parse the company object of a companies/get response, keeping the envelope."""
+        if not isinstance(data, dict) or not isinstance(data.get('data'), dict):
+            return data
+        return dict(data, data=records.parse_company(data['data'], fields))
+
+    @staticmethod
+    @cached('linkedin:company', ttl=COMPANY_CACHE_TTL, negative_ttl=NOT_FOUND_CACHE_TTL)
+    @timed('linkedin', 'get_company_by_name')
+    def get_company_by_name(linkedin_name: str, fields: str = None):
+        """`fields` keeps only those keys of the company record."""
+        invalid = LinkedInWrapper._check_company_args(linkedin_name)
+        if invalid:
+            return invalid
+        url, headers, params = LinkedInWrapper._company_request(linkedin_name)
         try:
-            resp = requests.get(url, headers=headers, params=params, timeout=15)
+            with timing.phase('linkedin.company'):
+                resp = http_pool.get(url, headers=headers, params=params, timeout=15)
             resp.raise_for_status()
-            data = resp.json()
-            return {
-                'query': linkedin_name,
-                'data': data
-            }
+            with timing.phase('linkedin.parse'):
+                return {
+                    'query': linkedin_name,
+                    'data': LinkedInWrapper._project_company(resp.json(), fields)
+                }
         except requests.RequestException as e:
             logger.error(f"LinkedIn RapidAPI error: {str(e)}")
             status = getattr(getattr(e, 'response', None), 'status_code', None)
@@ -0,0 +1,162 @@
+"""Compact records for wrapper results and the parsers that build them.
+
+Records are frozen, slotted dataclasses: a parsed post or channel costs a
+fixed handful of slots instead of a dict, which adds up when large
+listings sit in the in-process cache. orjson serializes them directly, and
+they also answer `get`/`[]`/`keys()` so code written against the old dict
+results (and dicts read back from Redis) keeps working unchanged.
+
+Each parser has a fast path for the usual upstream shape and falls back to
+the generic path walker in `fields` when keys are missing. A sparse
+fieldset (see `fields`) always yields a plain dict holding just those keys.
+"""
+from dataclasses import dataclass
+from typing import Any, Optional
+from . import fields as fieldsets
+
+
+class Record:
+    __slots__ = ()
+
+    def keys(self):
+        return self.__slots__
+
+    def __getitem__(self, name: str):
+        if name not in self.__slots__:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.__slots__
+
+    def get(self, name: str, default=None):
+        return getattr(self, name, default) if name in self.__slots__ else default
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+@dataclass(frozen=True, slots=True)
+class RedditPost(Record):
+    id: Optional[str]
+    title: Optional[str]
+    score: Optional[int]
+    comments: Optional[int]
+    author: Optional[str]
+    url: Optional[str]
+    created: Optional[float]
+
+
+@dataclass(frozen=True, slots=True)
+class YouTubeVideo(Record):
+    video_id: Optional[str]
+    title: Optional[str]
+    description: Optional[str]
+    thumbnail: Optional[str]
+    channel: Optional[str]
+    published_at: Optional[str]
+
+
+@dataclass(frozen=True, slots=True)
+class YouTubeChannel(Record):
+    channel_id: Optional[str]
+    channel_name: Optional[str]
+    description: Optional[str]
+    thumbnail: Optional[str]
+    subscribers: Optional[str]
+    total_views: Optional[str]
+    total_videos: Optional[str]
+    created: Optional[str]
+
+
+@dataclass(frozen=True, slots=True)
+class LinkedInCompany(Record):
+    name: Optional[str]
+    universalName: Optional[str]
+    description: Optional[str]
+    staffCount: Optional[int]
+    industries: Optional[Any]
+    website: Optional[str]
+    url: Optional[str]
+
+
+# Output fields and where they come from upstream ('/' separates nested keys;
+# the YouTube paths double as the Data API `fields` mask)
+POST_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'score': 'score',
+    'comments': 'num_comments',
+    'author': 'author',
+    'url': 'url',
+    'created': 'created_utc',
+}
+VIDEO_FIELDS = {
+    'video_id': 'id/videoId',
+    'title': 'snippet/title',
+    'description': 'snippet/description',
+    'thumbnail': 'snippet/thumbnails/default/url',
+    'channel': 'snippet/channelTitle',
+    'published_at': 'snippet/publishedAt',
+}
+CHANNEL_FIELDS = {
+    'channel_id': 'id',
+    'channel_name': 'snippet/title',
+    'description': 'snippet/description',
+    'thumbnail': 'snippet/thumbnails/default/url',
+    'subscribers': 'statistics/subscriberCount',
+    'total_views': 'statistics/viewCount',
+    'total_videos': 'statistics/videoCount',
+    'created': 'snippet/publishedAt',
+}
+COMPANY_FIELDS = LinkedInCompany.__slots__
+
+
+def parse_post(data: dict, fields: str = None):
+    """A listing child's `data` -> RedditPost (dict for a sparse fieldset)."""
+    if fields is not None:
+        return fieldsets.build(data, fieldsets.select(POST_FIELDS, fields))
+    get = data.get
+    return RedditPost(get('id'), get('title'), get('score'), get('num_comments'), get('author'), get('url'),
+                      get('created_utc'))
+
+def parse_posts(children: list, fields: str = None) -> list:
+    if fields is not None:
+        selected = fieldsets.select(POST_FIELDS, fields)
+        return [fieldsets.build(child.get('data', {}), selected) for child in children]
+    return [parse_post(child.get('data', {})) for child in children]
+
+def parse_video(item: dict, fields: str = None):
+    """A search.list item -> YouTubeVideo (dict for a sparse fieldset)."""
+    if fields is not None:
+        return fieldsets.build(item, fieldsets.select(VIDEO_FIELDS, fields))
+    try:
+        snippet = item['snippet']
+        return YouTubeVideo(item['id']['videoId'], snippet['title'], snippet['description'],
+                            snippet['thumbnails']['default']['url'], snippet['channelTitle'], snippet['publishedAt'])
+    except (KeyError, TypeError):
+        return YouTubeVideo(**fieldsets.build(item, fieldsets.select(VIDEO_FIELDS)))
+
+def parse_channel(item: dict, fields: str = None):
+    """A channels.list item -> YouTubeChannel (dict for a sparse fieldset)."""
+    if fields is not None:
+        return fieldsets.build(item, fieldsets.select(CHANNEL_FIELDS, fields))
+    try:
+        snippet, stats = item['snippet'], item['statistics']
+        return YouTubeChannel(item['id'], snippet['title'], snippet['description'],
+                              snippet['thumbnails']['default']['url'], stats['subscriberCount'], stats['viewCount'],
+                              stats['videoCount'], snippet['publishedAt'])
+    except (KeyError, TypeError):
+        return YouTubeChannel(**fieldsets.build(item, fieldsets.select(CHANNEL_FIELDS)))
+
+def parse_company(data, fields: str = None):
+    """The company object of a companies/get response -> LinkedInCompany.
+    Objects carrying keys the record does not know are passed through as
+    they are, so nothing the upstream sends is dropped."""
+    if not isinstance(data, dict):
+        return data
+    if fields is not None:
+        return fieldsets.project(data, fields)
+    if not data.keys() <= set(COMPANY_FIELDS):
+        return data
+    return LinkedInCompany(**{name: data.get(name) for name in COMPANY_FIELDS})
@@ -1,78 +1,171 @@
+import os
 import requests
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from app.utils import http_pool, snapshots, timing
+from app.utils.metrics import timed
+from app.utils.cache import FAILED, NEGATIVE_TTL, NOT_FOUND, OK, cached
+from . import records
 
 logger = logging.getLogger(__name__)
 
+def _classify_posts(result):
+    # Empty listings are real results; 403/404 mean the subreddit is missing or private
+    message = result.get('message')
+    if message in (None, 'No posts found'):
+        return OK
+    return NOT_FOUND if message == 'No subreddit found or access forbidden' else FAILED
+
 class RedditWrapper:
-    BASE_URL = "https://www.reddit.com"
+    BASE_URL = os.getenv('REDDIT_BASE_URL', "https://www.reddit.com")
+    HEADERS = {
+        "User-Agent": "SocialInsightsAPI/1.0 (by YourUsername)"
+    }
+    POSTS_CACHE_TTL = int(os.getenv('CACHE_TTL_REDDIT_POSTS', 60))
+    INFO_CACHE_TTL = int(os.getenv('CACHE_TTL_REDDIT_INFO', 600))
+    # How long an expired entry may still be served while it is refreshed in the background
+    POSTS_STALE_TTL = int(os.getenv('CACHE_STALE_TTL_REDDIT_POSTS', 300))
+    INFO_STALE_TTL = int(os.getenv('CACHE_STALE_TTL_REDDIT_INFO', 3600))
+    LISTING_CACHE_TTL = int(os.getenv('CACHE_TTL_REDDIT_LISTING', 300))
+    # How long a missing or private subreddit is remembered as such
+    NOT_FOUND_CACHE_TTL = int(os.getenv('CACHE_NEGATIVE_TTL_REDDIT', NEGATIVE_TTL))
+    # Reddit listings return at most 100 posts per page
+    PAGE_SIZE = 100
+    POST_FIELDS = records.POST_FIELDS
+
+    @staticmethod
+    def _not_found(subreddit: str):
+        return {
+            'subreddit': subreddit,
+            'posts_count': 0,
+            'posts': [],
+            'message': 'No subreddit found or access forbidden'
+        }
+
+    @staticmethod
+    def _failed(subreddit: str):
+        return {'subreddit': subreddit, 'posts_count': 0, 'posts': [], 'message': 'Failed to fetch Reddit data'}
+
+    @staticmethod
+    def _parse_post(post_data: dict, fields: str = None):
+        return records.parse_post(post_data, fields)
+
+    @staticmethod
+    def _parse_posts(subreddit: str, data: dict, fields: str = None):
+        posts = records.parse_posts(data.get('data', {}).get('children', []), fields)
+        result = {
+            'subreddit': subreddit,
+            'posts_count': len(posts),
+            'posts': posts
+        }
+        if len(posts) == 0:
+            result['message'] = 'No posts found'
+        return result
 
     @staticmethod
-    def get_subreddit_posts(subreddit: str, limit: int = 10):
+    def _parse_info(data: dict):
+        data = data.get('data', {})
+        return {
+            'name': data.get('display_name'),
+            'subscribers': data.get('subscribers'),
+            'description': data.get('public_description'),
+            'created': data.get('created_utc')
+        }
+
+    @staticmethod
+    @cached('reddit:posts', ttl=POSTS_CACHE_TTL, classify=_classify_posts, stale_ttl=POSTS_STALE_TTL,
+            negative_ttl=NOT_FOUND_CACHE_TTL)
+    @timed('reddit', 'get_subreddit_posts')
+    def get_subreddit_posts(subreddit: str, limit: int = 10, fields: str = None):
+        """`fields` (canonical, see wrappers.fields) limits which post fields are built."""
         try:
-            headers = {
-                "User-Agent": "SocialInsightsAPI/1.0 (by YourUsername)"
-            }
             url = f"{RedditWrapper.BASE_URL}/r/{subreddit}/hot.json"
             params = {"limit": limit}
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            with timing.phase('reddit.hot'):
+                response = http_pool.get(url, headers=RedditWrapper.HEADERS, params=params, timeout=10)
             # If subreddit is missing/private/quarantined, Reddit may return 403/404
             if response.status_code in (403, 404):
-                return {
-                    'subreddit': subreddit,
-                    'posts_count': 0,
-                    'posts': [],
-                    'message': 'No subreddit found or access forbidden'
-                }
+                return RedditWrapper._not_found(subreddit)
             response.raise_for_status()
-            data = response.json()
-            posts = []
-            for child in data.get('data', {}).get('children', []):
-                post_data = child.get('data', {})
-                posts.append({
-                    'title': post_data.get('title'),
-                    'score': post_data.get('score'),
-                    'comments': post_data.get('num_comments'),
-                    'author': post_data.get('author'),
-                    'url': post_data.get('url'),
-                    'created': post_data.get('created_utc')
-                })
-            result = {
-                'subreddit': subreddit,
-                'posts_count': len(posts),
-                'posts': posts
-            }
-            if len(posts) == 0:
-                result['message'] = 'No posts found'
+            with timing.phase('reddit.parse'):
+                result = RedditWrapper._parse_posts(subreddit, response.json(), fields)
+            if fields is None:
+                snapshots.record_posts(subreddit, result['posts'])
             return result
         except requests.RequestException as e:
             logger.error(f"Reddit API error: {str(e)}")
             # Try to extract status code for friendlier message
             status = getattr(getattr(e, 'response', None), 'status_code', None)
             if status in (403, 404):
-                return {
-                    'subreddit': subreddit,
-                    'posts_count': 0,
-                    'posts': [],
-                    'message': 'No subreddit found or access forbidden'
-                }
-            return {'subreddit': subreddit, 'posts_count': 0, 'posts': [], 'message': 'Failed to fetch Reddit data'}
+                return RedditWrapper._not_found(subreddit)
+            return RedditWrapper._failed(subreddit)
+
+    @staticmethod
+    @timed('reddit', 'fetch_listing')
+    def _fetch_listing(subreddit: str, limit: int, after: str = None):
+        params = {"limit": limit}
+        if after:
+            params["after"] = after
+        url = f"{RedditWrapper.BASE_URL}/r/{subreddit}/hot.json"
+        response = http_pool.get(url, headers=RedditWrapper.HEADERS, params=params, timeout=10)
+        response.raise_for_status()
+        return response.json().get('data', {})
+
+    @staticmethod
+    def iter_subreddit_posts(subreddit: str, total: int, page_size: int = PAGE_SIZE, fields: str = None):
+        """Yield up to `total` posts, following Reddit's `after` cursor.
+
+        The next page is requested in the background while the current one
+        is consumed, so memory stays at about two pages. Upstream errors
+        are raised as requests.RequestException.
+        """
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='reddit-prefetch')
+        try:
+            future = executor.submit(RedditWrapper._fetch_listing, subreddit, min(page_size, total))
+            remaining = total
+            while future is not None:
+                listing = future.result()
+                children = listing.get('children', [])[:remaining]
+                remaining -= len(children)
+                after = listing.get('after')
+                future = None
+                if after and children and remaining > 0:
+                    future = executor.submit(RedditWrapper._fetch_listing, subreddit, min(page_size, remaining), after)
+                posts = records.parse_posts(children, fields)
+                if fields is None:
+                    snapshots.record_posts(subreddit, posts)
+                yield from posts
+        finally:
+            # Runs on early close too (client disconnect); drop any queued prefetch
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    @cached('reddit:listing', ttl=LISTING_CACHE_TTL, classify=_classify_posts, negative_ttl=NOT_FOUND_CACHE_TTL)
+    def get_subreddit_listing(subreddit: str, total: int = 1000):
+        """Up to `total` posts across pages as one cached result, in
+        get_subreddit_posts shape (for analytics over large sets)."""
+        try:
+            posts = list(RedditWrapper.iter_subreddit_posts(subreddit, total))
+        except requests.RequestException as e:
+            logger.error(f"Reddit API error: {str(e)}")
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            if status in (403, 404):
+                return RedditWrapper._not_found(subreddit)
+            return RedditWrapper._failed(subreddit)
+        result = {'subreddit': subreddit, 'posts_count': len(posts), 'posts': posts}
+        if not posts:
+            result['message'] = 'No posts found'
+        return result
 
     @staticmethod
+    @cached('reddit:info', ttl=INFO_CACHE_TTL, stale_ttl=INFO_STALE_TTL)
+    @timed('reddit', 'get_subreddit_info')
     def get_subreddit_info(subreddit: str):
         try:
-            headers = {
-                "User-Agent": "SocialInsightsAPI/1.0 (by YourUsername)"
-            }
             url = f"{RedditWrapper.BASE_URL}/r/{subreddit}/about.json"
-            response = requests.get(url, headers=headers, timeout=10)
+            response = http_pool.get(url, headers=RedditWrapper.HEADERS, timeout=10)
             response.raise_for_status()
-            data = response.json().get('data', {})
-            return {
-                'name': data.get('display_name'),
-                'subscribers': data.get('subscribers'),
-                'description': data.get('public_description'),
-                'created': data.get('created_utc')
-            }
+            return RedditWrapper._parse_info(response.json())
         except requests.RequestException as e:
             logger.error(f"Reddit API error: {str(e)}")
             return {'error': f'Failed to fetch subreddit info: {str(e)}'}
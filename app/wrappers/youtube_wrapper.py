@@ -1,153 +1,303 @@
 import requests
 import logging
+import hashlib
+import json
 import os
+from app.utils import http_pool, metrics, quota, snapshots, timing
+from app.utils.metrics import timed
+from app.utils.cache import NEGATIVE_TTL, cached, EntityStore
+from app.utils.resilience import UpstreamUnavailable
+from . import fields as fieldsets, records as parsers
 
 logger = logging.getLogger(__name__)
 
 class YouTubeWrapper:
-    BASE_URL = "https://www.googleapis.com/youtube/v3"
+    BASE_URL = os.getenv('YOUTUBE_BASE_URL', "https://www.googleapis.com/youtube/v3")
     API_KEY = os.getenv('YOUTUBE_API_KEY')
+    CHANNEL_CACHE_TTL = int(os.getenv('CACHE_TTL_YOUTUBE_CHANNEL', 600))
+    SEARCH_CACHE_TTL = int(os.getenv('CACHE_TTL_YOUTUBE_SEARCH', 900))
+    CHANNEL_SEARCH_CACHE_TTL = int(os.getenv('CACHE_TTL_YOUTUBE_CHANNEL_SEARCH', 900))
+    # How long an expired entry may still be served while it is refreshed in the background
+    CHANNEL_STALE_TTL = int(os.getenv('CACHE_STALE_TTL_YOUTUBE_CHANNEL', 1800))
+    SEARCH_STALE_TTL = int(os.getenv('CACHE_STALE_TTL_YOUTUBE_SEARCH', 1800))
+    CHANNEL_SEARCH_STALE_TTL = int(os.getenv('CACHE_STALE_TTL_YOUTUBE_CHANNEL_SEARCH', 1800))
+    # How long a channel ID the API does not know is remembered as missing
+    NOT_FOUND_CACHE_TTL = int(os.getenv('CACHE_NEGATIVE_TTL_YOUTUBE', NEGATIVE_TTL))
+    # channels.list accepts at most 50 comma-separated IDs per call
+    CHANNELS_PER_REQUEST = 50
+    # Per-channel statistics shared by get_channel_stats, get_channels_stats and search_channels
+    CHANNEL_STORE = EntityStore('youtube:channel', int(os.getenv('CACHE_TTL_YOUTUBE_CHANNEL_STATS', CHANNEL_CACHE_TTL)))
+    # Channel IDs channels.list answered without an item, so batches skip them
+    MISSING_CHANNELS = EntityStore('youtube:channel_missing', NOT_FOUND_CACHE_TTL)
+    # Output fields and their paths in API items; the paths double as the API's `fields` mask
+    CHANNEL_FIELDS = parsers.CHANNEL_FIELDS
+    VIDEO_FIELDS = parsers.VIDEO_FIELDS
+    SORT_FIELDS = {
+        'name': 'channel_name',
+        'subscribers': 'subscribers',
+        'total_views': 'total_views'
+    }
+    # A channel search only needs the IDs; channels.list supplies the rest
+    CHANNEL_IDS_MASK = 'etag,items(id/channelId)'
+    # Last ETag and parsed result per request, kept well past the response TTLs so expired entries revalidate with If-None-Match
+    VALIDATOR_STORE = EntityStore('youtube:etag', int(os.getenv('CACHE_TTL_YOUTUBE_ETAG', 86400)))
 
     @staticmethod
-    def get_channel_stats(channel_id: str):
-        try:
-            if not YouTubeWrapper.API_KEY:
-                return {'error': 'YouTube API key not configured'}
-            url = f"{YouTubeWrapper.BASE_URL}/channels"
-            params = {
-                'part': 'statistics,snippet,contentDetails',
-                'id': channel_id,
-                'key': YouTubeWrapper.API_KEY
-            }
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            if not data.get('items'):
-                return {'error': 'Channel not found'}
-            item = data['items'][0]
-            snippet = item.get('snippet', {})
-            stats = item.get('statistics', {})
-            return {
-                'channel_id': channel_id,
-                'channel_name': snippet.get('title'),
-                'description': snippet.get('description'),
-                'thumbnail': snippet.get('thumbnails', {}).get('default', {}).get('url'),
-                'subscribers': stats.get('subscriberCount'),
-                'total_views': stats.get('viewCount'),
-                'total_videos': stats.get('videoCount'),
-                'created': snippet.get('publishedAt')
-            }
-        except requests.RequestException as e:
-            logger.error(f"YouTube API error: {str(e)}")
-            return {'error': f'Failed to fetch YouTube data: {str(e)}'}
+    def _channel_stats_params(channel_id: str, fields: str = None):
+        """channels.list params; with `fields`, only the parts and item paths those fields need."""
+        params = {
+            'part': 'statistics,snippet',
+            'id': channel_id,
+            'key': YouTubeWrapper.API_KEY
+        }
+        if fields is not None:
+            selected = fieldsets.select(YouTubeWrapper.CHANNEL_FIELDS, fieldsets.merge(fields, 'channel_id'))
+            parts = [part for part in ('statistics', 'snippet') if any(keys[0] == part for _, keys in selected)]
+            params['part'] = ','.join(parts) or 'id'
+            params['fields'] = fieldsets.api_mask(selected)
+        return params
+
+    @staticmethod
+    def _search_params(query: str, max_results: int, kind: str, mask: str = None):
+        params = {
+            'part': 'snippet',
+            'q': query,
+            'maxResults': max_results,
+            'type': kind,
+            'key': YouTubeWrapper.API_KEY
+        }
+        if mask:
+            params['fields'] = mask
+        return params
+
+    @staticmethod
+    def _channel_record(item: dict, fields: str = None):
+        return parsers.parse_channel(item, fields)
+
+    @staticmethod
+    def _parse_channel_records(data: dict, fields: str = None):
+        return {item['id']: parsers.parse_channel(item, fields) for item in data.get('items', []) if item.get('id')}
+
+    @staticmethod
+    def _channel_summary(record: dict):
+        """search_channels shape: counts as ints, missing counts as 0."""
+        summary = dict(record)
+        for field in ('subscribers', 'total_views', 'total_videos'):
+            if field in summary:
+                summary[field] = int(record[field]) if record[field] is not None else 0
+        return summary
+
+    @staticmethod
+    def _parse_videos(query: str, data: dict, fields: str = None):
+        videos = [parsers.parse_video(item, fields) for item in data.get('items', [])]
+        return {
+            'query': query,
+            'results_count': len(videos),
+            'videos': videos
+        }
+
+    @staticmethod
+    def _video_search_params(query: str, max_results: int, fields: str = None):
+        mask = None
+        if fields is not None:
+            mask = fieldsets.api_mask(fieldsets.select(YouTubeWrapper.VIDEO_FIELDS, fields))
+        return YouTubeWrapper._search_params(query, max_results, 'video', mask)
+
+    @staticmethod
+    def _channel_search_fields(fields: str, sort: str):
+        return fieldsets.merge(fields, 'channel_id', YouTubeWrapper.SORT_FIELDS.get(sort, 'channel_name'))
+
+    @staticmethod
+    def _parse_channel_ids(data: dict):
+        return [item.get('id', {}).get('channelId') for item in data.get('items', []) if item.get('id', {}).get('channelId')]
+
+    @staticmethod
+    def _sorted_channels(query: str, channels: list, sort: str, order: str):
+        sort_key = YouTubeWrapper.SORT_FIELDS.get(sort, 'channel_name')
+        reverse = (order.lower() != 'asc')
+        with timing.phase('sort'):
+            channels.sort(key=lambda c: c.get(sort_key) or 0, reverse=reverse)
+
+        return {
+            'query': query,
+            'results_count': len(channels),
+            'sort': sort_key,
+            'order': 'desc' if reverse else 'asc',
+            'channels': channels
+        }
 
     @staticmethod
-    def search_videos(query: str, max_results: int = 5):
+    def _conditional_request(resource: str, params: dict):
+        """Return (validator_key, stored, headers) for a conditional GET of
+        `resource`; headers carry If-None-Match when an ETag is stored."""
+        # The API key is left out so rotating it keeps the stored validators
+        request_id = json.dumps([resource, {k: v for k, v in params.items() if k != 'key'}], sort_keys=True, default=str)
+        key = hashlib.sha1(request_id.encode()).hexdigest()
+        stored = YouTubeWrapper.VALIDATOR_STORE.get(key)
+        headers = {'If-None-Match': stored['etag']} if stored else None
+        return key, stored, headers
+
+    @staticmethod
+    def _conditional_result(key: str, stored, response, parse):
+        """Reuse the stored result on 304; otherwise parse the body and
+        remember it with its ETag. Raises for error statuses."""
+        if response.status_code == 304 and stored:
+            metrics.cache_event('not_modified')
+            return stored['data']
+        response.raise_for_status()
+        with timing.phase('youtube.parse'):
+            body = response.json()
+            result = parse(body)
+        etag = response.headers.get('ETag') or (f'"{body["etag"]}"' if body.get('etag') else None)
+        if etag:
+            YouTubeWrapper.VALIDATOR_STORE.set(key, {'etag': etag, 'data': result})
+        return result
+
+    @staticmethod
+    def _conditional_get(resource: str, params: dict, parse):
+        key, stored, headers = YouTubeWrapper._conditional_request(resource, params)
+        with timing.phase(f'youtube.{resource}'):
+            charged = quota.youtube.spend(resource)
+            try:
+                response = http_pool.get(f"{YouTubeWrapper.BASE_URL}/{resource}", params=params, headers=headers,
+                                         timeout=10)
+            except UpstreamUnavailable:
+                # Shed before anything was sent; Google never saw the call
+                if charged:
+                    quota.youtube.refund(resource)
+                raise
+        return YouTubeWrapper._conditional_result(key, stored, response, parse)
+
+    @staticmethod
+    def _channel_not_found():
+        return {'error': 'Channel not found', 'status': 404}
+
+    @staticmethod
+    def _channels_to_fetch(channel_ids: list, records: dict) -> list:
+        """IDs neither in CHANNEL_STORE (`records`) nor remembered as missing."""
+        missing = [channel_id for channel_id in channel_ids if channel_id not in records]
+        known_missing = YouTubeWrapper.MISSING_CHANNELS.get_many(missing) if missing else {}
+        return [channel_id for channel_id in missing if channel_id not in known_missing]
+
+    @staticmethod
+    def _remember_missing(chunk: list, fetched: dict):
+        absent = {channel_id: True for channel_id in chunk if channel_id not in fetched}
+        if absent:
+            YouTubeWrapper.MISSING_CHANNELS.set_many(absent)
+
+    @staticmethod
+    def _store_channel_records(fetched: dict, fields: str = None):
+        # Only full records go into the shared store and the snapshot history
+        if fields is None:
+            YouTubeWrapper.CHANNEL_STORE.set_many(fetched)
+            snapshots.record_channels(fetched)
+
+    @staticmethod
+    def _project_channel_records(records: dict, fields: str = None):
+        if fields is None:
+            return records
+        return {channel_id: fieldsets.project(record, fields) for channel_id, record in records.items()}
+
+    @staticmethod
+    @timed('youtube', 'channels_list')
+    def _fetch_channel_records(channel_ids: list, fields: str = None):
+        """channels.list for IDs not in CHANNEL_STORE, in chunks of 50.
+        Returns (records, errors) keyed by channel ID and fills the store.
+        With `fields`, misses are fetched with a matching API field mask."""
+        records = YouTubeWrapper.CHANNEL_STORE.get_many(channel_ids)
+        missing = YouTubeWrapper._channels_to_fetch(channel_ids, records)
+        errors = {}
+        size = YouTubeWrapper.CHANNELS_PER_REQUEST
+        parse = lambda data: YouTubeWrapper._parse_channel_records(data, fields)  # noqa: E731
+        for start in range(0, len(missing), size):
+            chunk = missing[start:start + size]
+            try:
+                params = YouTubeWrapper._channel_stats_params(','.join(chunk), fields)
+                fetched = YouTubeWrapper._conditional_get('channels', params, parse)
+            except requests.RequestException as e:
+                logger.error(f"YouTube API error: {str(e)}")
+                errors.update({channel_id: str(e) for channel_id in chunk})
+                continue
+            YouTubeWrapper._remember_missing(chunk, fetched)
+            YouTubeWrapper._store_channel_records(fetched, fields)
+            records.update(fetched)
+        return YouTubeWrapper._project_channel_records(records, fields), errors
+
+    @staticmethod
+    @cached('youtube:channel', ttl=CHANNEL_CACHE_TTL, stale_ttl=CHANNEL_STALE_TTL, negative_ttl=NOT_FOUND_CACHE_TTL)
+    def get_channel_stats(channel_id: str, fields: str = None):
+        if not YouTubeWrapper.API_KEY:
+            return {'error': 'YouTube API key not configured'}
+        records, errors = YouTubeWrapper._fetch_channel_records([channel_id], fields)
+        if channel_id in errors:
+            return {'error': f'Failed to fetch YouTube data: {errors[channel_id]}'}
+        record = records.get(channel_id)
+        if record is None:
+            return YouTubeWrapper._channel_not_found()
+        # Full records already carry channel_id; keep the compact record as the cached result
+        return record if fields is None else dict(record, channel_id=channel_id)
+
+    @staticmethod
+    def get_channels_stats(channel_ids: list):
+        """Stats for many channels, packed into channels.list calls of up
+        to 50 IDs. Returns a dict keyed by channel ID in get_channel_stats
+        shape; IDs the API does not return map to 'Channel not found'."""
+        if not YouTubeWrapper.API_KEY:
+            return {channel_id: {'error': 'YouTube API key not configured'} for channel_id in channel_ids}
+        records, errors = YouTubeWrapper._fetch_channel_records(channel_ids)
+        results = {}
+        for channel_id in channel_ids:
+            if channel_id in errors:
+                results[channel_id] = {'error': f'Failed to fetch YouTube data: {errors[channel_id]}'}
+            elif channel_id in records:
+                results[channel_id] = dict(records[channel_id], channel_id=channel_id)
+            else:
+                results[channel_id] = YouTubeWrapper._channel_not_found()
+        return results
+
+    @staticmethod
+    @cached('youtube:search', ttl=SEARCH_CACHE_TTL, stale_ttl=SEARCH_STALE_TTL)
+    @timed('youtube', 'search_videos')
+    def search_videos(query: str, max_results: int = 5, fields: str = None):
         try:
             if not YouTubeWrapper.API_KEY:
                 return {'error': 'YouTube API key not configured'}
-            url = f"{YouTubeWrapper.BASE_URL}/search"
-            params = {
-                'part': 'snippet',
-                'q': query,
-                'maxResults': max_results,
-                'type': 'video',
-                'key': YouTubeWrapper.API_KEY
-            }
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            videos = []
-            for item in data.get('items', []):
-                snippet = item.get('snippet', {})
-                videos.append({
-                    'video_id': item.get('id', {}).get('videoId'),
-                    'title': snippet.get('title'),
-                    'description': snippet.get('description'),
-                    'thumbnail': snippet.get('thumbnails', {}).get('default', {}).get('url'),
-                    'channel': snippet.get('channelTitle'),
-                    'published_at': snippet.get('publishedAt')
-                })
-            return {
-                'query': query,
-                'results_count': len(videos),
-                'videos': videos
-            }
+            params = YouTubeWrapper._video_search_params(query, max_results, fields)
+            return YouTubeWrapper._conditional_get(
+                'search', params, lambda data: YouTubeWrapper._parse_videos(query, data, fields))
         except requests.RequestException as e:
             logger.error(f"YouTube API error: {str(e)}")
             return {'error': f'Failed to search videos: {str(e)}'}
 
     @staticmethod
-    def search_channels(query: str, max_results: int = 10, sort: str = 'name', order: str = 'desc'):
+    @cached('youtube:channel_search', ttl=CHANNEL_SEARCH_CACHE_TTL, stale_ttl=CHANNEL_SEARCH_STALE_TTL)
+    @timed('youtube', 'search_channels')
+    def search_channels(query: str, max_results: int = 10, sort: str = 'name', order: str = 'desc',
+                        fields: str = None):
         """Search channels by name and return stats, with sorting.
         sort: one of ['name', 'subscribers', 'total_views']
         order: 'asc' | 'desc'
+        fields: channel fields to return (the sort field is always included)
         """
         try:
             if not YouTubeWrapper.API_KEY:
                 return {'error': 'YouTube API key not configured'}
 
             # 1) Search channels by query
-            search_url = f"{YouTubeWrapper.BASE_URL}/search"
-            search_params = {
-                'part': 'snippet',
-                'q': query,
-                'maxResults': max_results,
-                'type': 'channel',
-                'key': YouTubeWrapper.API_KEY
-            }
-
-            s_resp = requests.get(search_url, params=search_params, timeout=10)
-            s_resp.raise_for_status()
-            s_data = s_resp.json()
-
-            channel_ids = [item.get('id', {}).get('channelId') for item in s_data.get('items', []) if item.get('id', {}).get('channelId')]
+            search_params = YouTubeWrapper._search_params(query, max_results, 'channel', YouTubeWrapper.CHANNEL_IDS_MASK)
+            channel_ids = YouTubeWrapper._conditional_get('search', search_params, YouTubeWrapper._parse_channel_ids)
             if not channel_ids:
                 return {'query': query, 'results_count': 0, 'channels': []}
 
-            # 2) Fetch channel stats in batch
-            details_url = f"{YouTubeWrapper.BASE_URL}/channels"
-            details_params = {
-                'part': 'statistics,snippet',
-                'id': ','.join(channel_ids),
-                'key': YouTubeWrapper.API_KEY
-            }
-            d_resp = requests.get(details_url, params=details_params, timeout=10)
-            d_resp.raise_for_status()
-            d_data = d_resp.json()
-
-            channels = []
-            for item in d_data.get('items', []):
-                snippet = item.get('snippet', {})
-                stats = item.get('statistics', {})
-                channels.append({
-                    'channel_id': item.get('id'),
-                    'channel_name': snippet.get('title'),
-                    'description': snippet.get('description'),
-                    'thumbnail': snippet.get('thumbnails', {}).get('default', {}).get('url'),
-                    'subscribers': int(stats.get('subscriberCount')) if stats.get('subscriberCount') is not None else 0,
-                    'total_views': int(stats.get('viewCount')) if stats.get('viewCount') is not None else 0,
-                    'total_videos': int(stats.get('videoCount')) if stats.get('videoCount') is not None else 0,
-                    'created': snippet.get('publishedAt')
-                })
+            # 2) Fetch stats in batch, only for channels not already known
+            records, errors = YouTubeWrapper._fetch_channel_records(
+                channel_ids, YouTubeWrapper._channel_search_fields(fields, sort))
+            if errors:
+                return {'error': f'Failed to search channels: {next(iter(errors.values()))}'}
+            channels = [YouTubeWrapper._channel_summary(records[channel_id]) for channel_id in channel_ids if channel_id in records]
 
             # 3) Sorting
-            key_map = {
-                'name': 'channel_name',
-                'subscribers': 'subscribers',
-                'total_views': 'total_views'
-            }
-            sort_key = key_map.get(sort, 'channel_name')
-            reverse = (order.lower() != 'asc')
-            channels.sort(key=lambda c: c.get(sort_key) or 0, reverse=reverse)
-
-            return {
-                'query': query,
-                'results_count': len(channels),
-                'sort': sort_key,
-                'order': 'desc' if reverse else 'asc',
-                'channels': channels
-            }
+            return YouTubeWrapper._sorted_channels(query, channels, sort, order)
 
         except requests.RequestException as e:
             logger.error(f"YouTube API error: {str(e)}")
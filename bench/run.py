@@ -0,0 +1,200 @@
+"""Load-test the Flask and FastAPI request paths against local stub upstreams.
+
+    python -m bench.run                                   # both services, defaults
+    python -m bench.run --targets flask --duration 20 --concurrency 64
+    python -m bench.run --latency-ms 150 --error-rate 0.02 --json bench_output.json
+    python -m bench.run --baseline bench_output.json      # print deltas against a previous run
+
+Starts the stubs from bench.stubs, runs flask_app under gunicorn (gthread)
+and fastapi_service under uvicorn with the wrappers pointed at the stubs,
+then drives each endpoint for --duration seconds with --concurrency
+in-flight requests and reports RPS and p50/p95/p99 latency. --distinct sets
+how many different keys each endpoint cycles through, which controls the
+cache hit ratio.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import asyncio
+import argparse
+import subprocess
+import tempfile
+import httpx
+import jwt
+from bench.stubs import StubConfig, StubUpstreams
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SECRET = 'bench-secret'
+
+FLASK_ENDPOINTS = {
+    'reddit': lambda i: ('/api/insights/reddit', {'subreddit': f'bench{i}', 'limit': 25}),
+    'youtube_channel': lambda i: ('/api/insights/youtube', {'channel_id': f'UCbench{i:017d}'}),
+    'youtube_search': lambda i: ('/api/insights/youtube/search', {'q': f'query {i}', 'max_results': 10}),
+    'youtube_channels': lambda i: ('/api/insights/youtube/channels', {'q': f'creator{i}', 'max_results': 10, 'sort': 'subscribers'}),
+    'linkedin': lambda i: ('/api/insights/linkedin/company', {'name': f'company{i}'}),
+    'trending': lambda i: ('/api/trending', {'platform': 'reddit'}),
+}
+
+FASTAPI_ENDPOINTS = {
+    'insights_all': lambda i: ('/async/insights/all', {
+        'subreddit': f'bench{i}', 'channel_id': f'UCbench{i:017d}', 'linkedin_name': f'company{i}'}),
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def state_env(workdir: str) -> dict:
+    """Environment that keeps a run's shared state (quota ledger, rate-limit
+    table, snapshot history) in `workdir` and gives YouTube a budget no run
+    can exhaust, so results measure the request path and not quota rejections."""
+    return {
+        'QUOTA_SHM_PATH': os.path.join(workdir, 'quota'),
+        'RATELIMIT_SHM_PATH': os.path.join(workdir, 'ratelimit'),
+        'SNAPSHOT_DB_PATH': os.path.join(workdir, 'snapshots.sqlite3'),
+        'YOUTUBE_DAILY_QUOTA': str(10 ** 12),
+    }
+
+
+def start_service(target: str, port: int, env: dict, args) -> subprocess.Popen:
+    if target == 'flask':
+        cmd = [sys.executable, '-m', 'gunicorn', 'flask_app:app', '-w', str(args.workers), '-k', 'gthread',
+               '--threads', str(args.threads), '-b', f'127.0.0.1:{port}', '--log-level', 'warning']
+    else:
+        cmd = [sys.executable, '-m', 'uvicorn', 'fastapi_service:app', '--host', '127.0.0.1', '--port', str(port),
+               '--workers', str(args.workers), '--log-level', 'warning', '--no-access-log']
+    return subprocess.Popen(cmd, cwd=ROOT, env=env)
+
+
+def wait_ready(base_url: str, path: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(base_url + path, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'{base_url} did not become ready in {timeout}s')
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def drive(base_url: str, make_request, token: str, duration: float, concurrency: int, distinct: int) -> dict:
+    latencies = []
+    statuses = {}
+    errors = 0
+    headers = {'Authorization': f'Bearer {token}'}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                path, params = make_request(random.randrange(distinct))
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path, params=params)
+                    await response.aread()
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        'transport_errors': errors,
+    }
+
+
+def report(results: dict, baseline: dict = None):
+    header = f"{'endpoint':<28}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  statuses"
+    print(header)
+    print('-' * len(header))
+    for name, row in results.items():
+        line = f"{name:<28}{row['rps']:>10}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}  {row['statuses']}"
+        previous = (baseline or {}).get(name)
+        if previous:
+            line += (f"  (rps {row['rps'] - previous['rps']:+.1f},"
+                     f" p95 {row['p95_ms'] - previous['p95_ms']:+.2f} ms)")
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark flask_app and fastapi_service against stub upstreams')
+    parser.add_argument('--targets', nargs='+', choices=['flask', 'fastapi'], default=['flask', 'fastapi'])
+    parser.add_argument('--endpoints', nargs='*', help='limit to these endpoint names')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--distinct', type=int, default=50, help='distinct keys per endpoint')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--jitter-ms', type=float, default=10)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--baseline', help='compare against a previous --json file')
+    args = parser.parse_args()
+
+    stubs = StubUpstreams(StubConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rate)).start()
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    env = dict(os.environ, **stubs.env(), **state_env(workdir), JWT_SECRET_KEY=SECRET, RATELIMIT_ENABLED='false')
+    token = jwt.encode({'user': 'bench', 'exp': int(time.time()) + 3600}, SECRET, algorithm='HS256')
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)['results']
+
+    results = {}
+    for target in args.targets:
+        port = free_port()
+        process = start_service(target, port, env, args)
+        base_url = f'http://127.0.0.1:{port}'
+        endpoints = FLASK_ENDPOINTS if target == 'flask' else FASTAPI_ENDPOINTS
+        try:
+            wait_ready(base_url, '/' if target == 'flask' else '/health')
+            for name, make_request in endpoints.items():
+                if args.endpoints and name not in args.endpoints:
+                    continue
+                results[f'{target}:{name}'] = asyncio.run(
+                    drive(base_url, make_request, token, args.duration, args.concurrency, args.distinct))
+        finally:
+            process.terminate()
+            process.wait(timeout=15)
+
+    stubs.stop()
+    shutil.rmtree(workdir, ignore_errors=True)
+    report(results, baseline)
+    print(f"upstream calls: {stubs.counters}")
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump({'config': vars(args), 'upstream_calls': stubs.counters, 'results': results}, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
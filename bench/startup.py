@@ -0,0 +1,157 @@
+"""Measure cold-start cost: import time and per-worker memory under gunicorn.
+
+    python -m bench.startup                               # defaults
+    python -m bench.startup --workers 4 --runs 10
+    python -m bench.startup --json startup.json --baseline previous.json
+
+Three measurements, each against the stubs from bench.stubs:
+
+  import     wall time to import flask_app / fastapi_service in a fresh
+             interpreter (median of --runs), i.e. what every new worker pays
+  boot       gunicorn start until the first request is answered, with and
+             without --preload
+  memory     per-worker RSS, PSS and USS (Linux /proc/<pid>/smaps_rollup)
+             after every endpoint has been hit once. PSS splits shared pages
+             between the processes mapping them and USS counts only private
+             ones, so the --preload saving shows up there rather than in RSS.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import statistics
+import subprocess
+import tempfile
+import httpx
+import jwt
+from bench.run import FLASK_ENDPOINTS, ROOT, SECRET, free_port, state_env, wait_ready
+from bench.stubs import StubConfig, StubUpstreams
+
+IMPORT_TARGETS = ('flask_app', 'fastapi_service')
+_IMPORT_SNIPPET = 'import time; started = time.perf_counter(); import {0}; print(time.perf_counter() - started)'
+
+
+def import_time(module: str, env: dict, runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', _IMPORT_SNIPPET.format(module)], cwd=ROOT, env=env,
+                             check=True, capture_output=True, text=True).stdout
+        samples.append(float(out.strip().splitlines()[-1]) * 1000)
+    return {'median_ms': round(statistics.median(samples), 1), 'min_ms': round(min(samples), 1)}
+
+
+def memory_kib(pid: int) -> dict:
+    """RSS/PSS/USS of one process in KiB, from /proc/<pid>/smaps_rollup."""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as fh:
+        for line in fh:
+            name, _, rest = line.partition(':')
+            parts = rest.split()
+            if len(parts) == 2 and parts[1] == 'kB':
+                fields[name] = int(parts[0])
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'uss': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+    }
+
+
+def children(pid: int) -> list:
+    with open(f'/proc/{pid}/task/{pid}/children') as fh:
+        return [int(child) for child in fh.read().split()]
+
+
+def boot(env: dict, args, preload: bool) -> dict:
+    port = free_port()
+    cmd = [sys.executable, '-m', 'gunicorn', 'flask_app:app', '-w', str(args.workers), '-k', 'gthread',
+           '--threads', str(args.threads), '-b', f'127.0.0.1:{port}', '--log-level', 'warning']
+    if preload:
+        cmd.append('--preload')
+    base_url = f'http://127.0.0.1:{port}'
+    started = time.perf_counter()
+    process = subprocess.Popen(cmd, cwd=ROOT, env=env)
+    try:
+        wait_ready(base_url, '/', timeout=60)
+        ready_ms = (time.perf_counter() - started) * 1000
+        # Every worker should load what a real request touches before measuring
+        token = jwt.encode({'user': 'bench', 'exp': int(time.time()) + 3600}, SECRET, algorithm='HS256')
+        with httpx.Client(base_url=base_url, headers={'Authorization': f'Bearer {token}'}, timeout=30) as client:
+            for i in range(args.workers * args.threads * 2):
+                for make_request in FLASK_ENDPOINTS.values():
+                    path, params = make_request(i)
+                    client.get(path, params=params)
+        workers = [memory_kib(pid) for pid in children(process.pid)]
+        master = memory_kib(process.pid)
+    finally:
+        process.terminate()
+        process.wait(timeout=15)
+    return {
+        'ready_ms': round(ready_ms, 1),
+        'master_kib': master,
+        'worker_kib': {key: round(statistics.mean(w[key] for w in workers)) for key in ('rss', 'pss', 'uss')},
+        'total_pss_kib': master['pss'] + sum(w['pss'] for w in workers),
+    }
+
+
+def report(results: dict, baseline: dict = None):
+    baseline = baseline or {}
+    print(f"{'import':<28}{'median ms':>12}{'min ms':>10}")
+    for name, row in results['import'].items():
+        line = f"{name:<28}{row['median_ms']:>12}{row['min_ms']:>10}"
+        previous = baseline.get('import', {}).get(name)
+        if previous:
+            line += f"  ({row['median_ms'] - previous['median_ms']:+.1f} ms)"
+        print(line)
+    print()
+    print(f"{'gunicorn':<28}{'ready ms':>10}{'RSS KiB':>10}{'PSS KiB':>10}{'USS KiB':>10}{'total PSS':>11}")
+    for name, row in results['boot'].items():
+        worker = row['worker_kib']
+        line = (f"{name:<28}{row['ready_ms']:>10}{worker['rss']:>10}{worker['pss']:>10}{worker['uss']:>10}"
+                f"{row['total_pss_kib']:>11}")
+        previous = baseline.get('boot', {}).get(name)
+        if previous:
+            line += f"  (PSS/worker {worker['pss'] - previous['worker_kib']['pss']:+d} KiB)"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure import time and per-worker memory of the services')
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per import measurement')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--baseline', help='compare against a previous --json file')
+    args = parser.parse_args()
+
+    stubs = StubUpstreams(StubConfig(latency_ms=0, jitter_ms=0)).start()
+    workdir = tempfile.mkdtemp(prefix='bench-startup-')
+    env = dict(os.environ, **stubs.env(), **state_env(workdir), JWT_SECRET_KEY=SECRET, RATELIMIT_ENABLED='false',
+               SNAPSHOTS_ENABLED='false')
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)['results']
+
+    results = {'import': {}, 'boot': {}}
+    try:
+        for module in IMPORT_TARGETS:
+            results['import'][module] = import_time(module, env, args.runs)
+        if sys.platform.startswith('linux'):
+            for preload in (False, True):
+                results['boot'][f"flask -w {args.workers}{' --preload' if preload else ''}"] = boot(env, args, preload)
+        else:
+            print('memory measurements need Linux /proc; skipping gunicorn runs', file=sys.stderr)
+    finally:
+        stubs.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report(results, baseline)
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump({'config': vars(args), 'results': results}, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""Local stand-ins for the Reddit, YouTube Data API and LinkedIn RapidAPI
+endpoints the wrappers call, with configurable latency and error injection.
+
+    python -m bench.stubs --latency-ms 80 --jitter-ms 20 --error-rate 0.01
+
+Each platform gets its own port so the wrappers see three distinct hosts,
+as they do in production.
+"""
+import json
+import time
+import hashlib
+import random
+import argparse
+import threading
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+LISTING_SIZE = 1000  # posts available per subreddit before the cursor runs out
+
+
+class StubConfig:
+    def __init__(self, latency_ms: float = 50, jitter_ms: float = 10, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+
+
+def _reddit(path, query):
+    parts = path.strip('/').split('/')
+    if len(parts) != 3 or parts[0] != 'r':
+        return 404, {'error': 404}
+    subreddit, resource = parts[1], parts[2]
+    if subreddit.startswith('missing'):
+        return 404, {'message': 'Not Found', 'error': 404}
+    if resource == 'about.json':
+        return 200, {'kind': 't5', 'data': {
+            'display_name': subreddit, 'subscribers': 1000 + len(subreddit) * 37,
+            'public_description': f'Stub subreddit {subreddit}', 'created_utc': 1200000000.0}}
+    if resource != 'hot.json':
+        return 404, {'error': 404}
+    limit = min(int(query.get('limit', ['25'])[0]), 100)
+    after = query.get('after', [None])[0]
+    start = int(after[3:]) if after else 0
+    end = min(start + limit, LISTING_SIZE)
+    now = time.time()
+    children = [{'kind': 't3', 'data': {
+        'id': f'{i:x}', 'name': f't3_{i}', 'title': f'{subreddit} post {i}',
+        'score': (i * 7919) % 5000, 'num_comments': (i * 104729) % 400, 'author': f'user{i % 97}',
+        'url': f'https://example.com/{subreddit}/{i}', 'created_utc': now - i * 90,
+        'selftext': 'x' * 200}} for i in range(start, end)]
+    return 200, {'kind': 'Listing', 'data': {
+        'after': f't3_{end}' if end < LISTING_SIZE else None, 'children': children}}
+
+
+def _youtube(path, query):
+    resource = path.rstrip('/').rsplit('/', 1)[-1]
+    if resource == 'search':
+        q = query.get('q', [''])[0]
+        max_results = min(int(query.get('maxResults', ['5'])[0]), 50)
+        if query.get('type', ['video'])[0] == 'channel':
+            items = [{'kind': 'youtube#searchResult', 'id': {'kind': 'youtube#channel', 'channelId': f'UC{q[:4]:x<4}{i:018d}'}}
+                     for i in range(max_results)]
+        else:
+            items = [{'kind': 'youtube#searchResult', 'id': {'kind': 'youtube#video', 'videoId': f'vid{i:08d}'},
+                      'snippet': {'title': f'{q} video {i}', 'description': 'd' * 300,
+                                  'thumbnails': {'default': {'url': f'https://i.ytimg.com/vi/{i}/default.jpg'}},
+                                  'channelTitle': f'Channel {i}', 'publishedAt': '2024-01-01T00:00:00Z'}}
+                     for i in range(max_results)]
+        return 200, {'kind': 'youtube#searchListResponse', 'etag': f'search-{q}', 'items': items}
+    if resource == 'channels':
+        ids = [i for i in query.get('id', [''])[0].split(',') if i and not i.startswith('UCmissing')]
+        items = [{'kind': 'youtube#channel', 'id': channel_id,
+                  'snippet': {'title': f'Channel {channel_id[-6:]}', 'description': 'c' * 300,
+                              'thumbnails': {'default': {'url': f'https://yt3.ggpht.com/{channel_id}'}},
+                              'publishedAt': '2015-05-05T00:00:00Z'},
+                  'statistics': {'subscriberCount': str(sum(map(ord, channel_id)) * 113),
+                                 'viewCount': str(sum(map(ord, channel_id)) * 99991), 'videoCount': '321'}}
+                 for channel_id in ids]
+        return 200, {'kind': 'youtube#channelListResponse', 'etag': f'channels-{len(ids)}', 'items': items}
+    return 404, {'error': {'code': 404}}
+
+
+def _linkedin(path, query):
+    name = query.get('linkedinName', [''])[0]
+    if not path.endswith('/v1/companies/get') or not name or name.startswith('missing'):
+        return 404, {'message': 'Not found'}
+    return 200, {'success': True, 'data': {
+        'name': name.title(), 'universalName': name, 'staffCount': len(name) * 100,
+        'description': 'l' * 500, 'industries': ['Software Development']}}
+
+
+ROUTES = {'reddit': _reddit, 'youtube': _youtube, 'linkedin': _linkedin}
+
+
+def make_handler(platform: str, config: StubConfig, counters: dict):
+    route = ROUTES[platform]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out as separate writes; with Nagle on, the body
+        # waits for the client's delayed ACK (~40 ms) on keep-alive connections
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            delay = max(0.0, random.gauss(config.latency_ms, config.jitter_ms)) / 1000
+            time.sleep(delay)
+            counters[platform] += 1
+            roll = random.random()
+            if roll < config.throttle_rate:
+                status, body, extra = 429, {'error': 'Too Many Requests'}, {'Retry-After': '1'}
+            elif roll < config.throttle_rate + config.error_rate:
+                status, body, extra = 503, {'error': 'Service Unavailable'}, {}
+            else:
+                status, body = route(parts.path, parse_qs(parts.query))
+                extra = {}
+            payload = json.dumps(body).encode()
+            if platform == 'youtube' and status == 200:
+                # The Data API supports conditional requests on its ETags
+                extra['ETag'] = f'"{hashlib.sha1(payload).hexdigest()}"'
+                if self.headers.get('If-None-Match') == extra['ETag']:
+                    status, payload = 304, b''
+                    counters['not_modified'] += 1
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            for name, value in extra.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+class StubUpstreams:
+    """Runs one stub server per platform on loopback in daemon threads."""
+
+    def __init__(self, config: StubConfig = None, host: str = '127.0.0.1'):
+        self.config = config or StubConfig()
+        self.host = host
+        self.counters = dict({platform: 0 for platform in ROUTES}, not_modified=0)
+        self.servers = {}
+
+    def start(self):
+        for platform in ROUTES:
+            server = ThreadingHTTPServer((self.host, 0), make_handler(platform, self.config, self.counters))
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name=f'stub-{platform}', daemon=True).start()
+            self.servers[platform] = server
+        return self
+
+    def url(self, platform: str) -> str:
+        return f'http://{self.host}:{self.servers[platform].server_port}'
+
+    def env(self) -> dict:
+        """Environment that points the wrappers at these stubs."""
+        return {
+            'REDDIT_BASE_URL': self.url('reddit'),
+            'YOUTUBE_BASE_URL': f"{self.url('youtube')}/youtube/v3",
+            'LINKEDIN_BASE_URL': self.url('linkedin'),
+            'YOUTUBE_API_KEY': 'stub-key',
+            'RAPIDAPI_KEY': 'stub-key',
+        }
+
+    def stop(self):
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run stub upstreams for local benchmarking')
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--jitter-ms', type=float, default=10)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 503')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction answered with 429 + Retry-After')
+    args = parser.parse_args()
+    stubs = StubUpstreams(StubConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rate)).start()
+    for name, value in stubs.env().items():
+        print(f'export {name}={value}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stubs.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,43 @@
-from fastapi import FastAPI, HTTPException, Query, Header
+from fastapi import FastAPI, HTTPException, Query, Header, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import httpx
+from contextlib import asynccontextmanager
+import jwt
 import logging
 import os
+import time
 import asyncio
 from datetime import datetime
+from operator import itemgetter
 from dotenv import load_dotenv
 
 load_dotenv()
 
-app = FastAPI(title="Social Media Insights Async Service")
+from app.auth import decode_token_async  # noqa: E402
+from app.security import Validator  # noqa: E402
+from app.utils import feeds, http_pool, metrics, quota, resilience, timing  # noqa: E402
+from app.utils.cache import offload  # noqa: E402
+from app.wrappers import AsyncRedditWrapper, AsyncYouTubeWrapper, AsyncLinkedInWrapper  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+# Per-upstream budget for the aggregate endpoint; slower upstreams are reported as timed out
+AGGREGATE_TIMEOUT = float(os.getenv('AGGREGATE_TIMEOUT', 5))
+# Live trending feeds: seconds between polls per platform, and items per poll
+FEED_INTERVALS = {
+    'reddit': float(os.getenv('FEED_REDDIT_INTERVAL', 30)),
+    'youtube': float(os.getenv('FEED_YOUTUBE_INTERVAL', 300)),
+}
+FEED_SIZE = int(os.getenv('FEED_SIZE', 25))
+
+@asynccontextmanager
+async def lifespan(app):
+    await http_pool.open_async_client()
+    yield
+    feeds.hub.close()
+    await http_pool.close_async_client()
+
+app = FastAPI(title="Social Media Insights Async Service", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,9 +47,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-logger = logging.getLogger(__name__)
+@app.middleware("http")
+async def record_request(request: Request, call_next):
+    metrics.request_started('fastapi')
+    started = time.perf_counter()
+    status = 500
+    # Set here so the endpoint's task inherits it and its phases land in this Timings
+    timing_token = timing.start()
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        server_timing = timing.finish(timing_token)
+        timing_token = None
+        if server_timing:
+            response.headers['Server-Timing'] = server_timing
+        return response
+    finally:
+        if timing_token is not None:
+            timing.finish(timing_token)
+        route = request.scope.get('route')
+        metrics.request_finished('fastapi', route.path if route else 'unmatched', request.method,
+                                 status, time.perf_counter() - started)
 
-YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY')
+@app.get("/metrics")
+async def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+async def authenticate(authorization: str):
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Authorization header required")
+    try:
+        with timing.phase('auth'):
+            return await decode_token_async(authorization.replace('Bearer ', ''))
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Token expired")
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token")
 
 @app.get("/")
 async def root():
@@ -31,38 +93,101 @@ async def root():
 async def get_all_insights(
     subreddit: str = Query("technology", min_length=2),
     channel_id: str = Query(None),
+    linkedin_name: str = Query(None),
     authorization: str = Header(None)
 ):
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Authorization header required")
+    await authenticate(authorization)
+
+    if not Validator.validate_subreddit(subreddit):
+        raise HTTPException(status_code=400, detail="Invalid subreddit name")
+    if channel_id and not Validator.validate_channel_id(channel_id):
+        raise HTTPException(status_code=400, detail="Invalid channel ID format")
+
+    calls = {'reddit': AsyncRedditWrapper.get_subreddit_posts(subreddit)}
+    if channel_id:
+        calls['youtube'] = AsyncYouTubeWrapper.get_channel_stats(channel_id)
+    if linkedin_name:
+        calls['linkedin'] = AsyncLinkedInWrapper.get_company_by_name(linkedin_name)
+
+    tasks = {name: asyncio.ensure_future(coro) for name, coro in calls.items()}
+    await asyncio.wait(tasks.values(), timeout=AGGREGATE_TIMEOUT)
+
+    results = {'reddit': None, 'youtube': None}
+    timed_out = []
+    for name, task in tasks.items():
+        if not task.done():
+            # The shared fetch keeps running and fills the cache for the next caller
+            task.cancel()
+            timed_out.append(name)
+            results[name] = {'error': 'Upstream timed out'}
+        elif task.exception() is not None:
+            logger.error(f"Aggregation error ({name}): {str(task.exception())}")
+            results[name] = {'error': 'Failed to fetch data'}
+        else:
+            results[name] = task.result()
+    results['partial'] = bool(timed_out)
+    results['timed_out'] = timed_out
+    results['aggregated_at'] = datetime.now().isoformat()
+    return results
+
+def _listing(data: dict, key: str):
+    # Wrapper failures come back as {'error': ...}; None tells the feed to keep its items
+    return None if 'error' in data else data.get(key, [])
+
+def _trending_source(platform: str, subreddit: str):
+    """(feed key, fetch, identify) for a trending feed."""
+    if platform == 'reddit':
+        async def fetch():
+            return _listing(await AsyncRedditWrapper.get_subreddit_posts(subreddit, limit=FEED_SIZE), 'posts')
+        return f'reddit:{subreddit}', fetch, itemgetter('id')
+
+    async def fetch():
+        # A feed is background work: past the reserve it keeps serving the cached search
+        with quota.background():
+            return _listing(await AsyncYouTubeWrapper.search_videos('trending', max_results=FEED_SIZE), 'videos')
+    return 'youtube:trending', fetch, itemgetter('video_id')
+
+@app.get("/async/trending/stream")
+async def trending_stream(
+    platform: str = Query("reddit"),
+    subreddit: str = Query("all", min_length=2),
+    access_token: str = Query(None),
+    authorization: str = Header(None),
+    last_event_id: str = Header(None),
+):
+    """Server-sent events: a `snapshot` of the trending items, then `update`
+    events carrying only changed items, removed ids and the new order. All
+    subscribers of a feed share one poller. Browsers' EventSource cannot
+    send headers, so the token may also be passed as `access_token`."""
+    await authenticate(authorization or access_token)
+
+    if platform not in FEED_INTERVALS:
+        raise HTTPException(status_code=400, detail="Unsupported platform")
+    if platform == 'reddit' and not Validator.validate_subreddit(subreddit):
+        raise HTTPException(status_code=400, detail="Invalid subreddit name")
+
+    key, fetch, identify = _trending_source(platform, subreddit.lower())
+    try:
+        frames = feeds.hub.subscribe(key, fetch, FEED_INTERVALS[platform], identify, last_event_id)
+    except feeds.FeedLimitExceeded as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return StreamingResponse(frames, media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.get("/async/feeds")
+async def feed_stats(authorization: str = Header(None)):
+    await authenticate(authorization)
+    return feeds.hub.stats()
+
+@app.get("/async/upstreams")
+async def upstream_health(authorization: str = Header(None)):
+    await authenticate(authorization)
+    return resilience.snapshot()
 
-    async with httpx.AsyncClient() as client:
-        tasks = [
-            client.get(
-                "http://localhost:5000/api/insights/reddit",
-                params={"subreddit": subreddit},
-                headers={"Authorization": authorization}
-            )
-        ]
-        if channel_id:
-            tasks.append(
-                client.get(
-                    "http://localhost:5000/api/insights/youtube",
-                    params={"channel_id": channel_id},
-                    headers={"Authorization": authorization}
-                )
-            )
-        try:
-            responses = await asyncio.gather(*tasks, return_exceptions=True)
-            results = {
-                'reddit': responses[0].json() if isinstance(responses[0], httpx.Response) else None,
-                'youtube': responses[1].json() if len(responses) > 1 and isinstance(responses[1], httpx.Response) else None,
-                'aggregated_at': datetime.now().isoformat()
-            }
-            return results
-        except Exception as e:
-            logger.error(f"Aggregation error: {str(e)}")
-            raise HTTPException(status_code=500, detail="Failed to aggregate insights")
+@app.get("/async/quota")
+async def quota_status(authorization: str = Header(None)):
+    await authenticate(authorization)
+    return {'youtube': await offload(quota.youtube.snapshot)}
 
 @app.get("/health")
 async def health_check():
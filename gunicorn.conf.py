@@ -0,0 +1,58 @@
+# Picked up automatically by gunicorn from the working directory (see Procfile).
+import gc
+import os
+import shutil
+import tempfile
+
+# Workers write metric samples here so /metrics can aggregate across processes.
+# Must be set before any worker imports prometheus_client. Unless configured,
+# each master makes its own directory (and removes it on exit), so a second
+# master on the host, e.g. during a blue/green restart, neither mixes its
+# samples in nor wipes the live one's. A directory inherited from another
+# master (USR2 re-exec passes its environment on) is not reused.
+_METRICS_OWNER = 'SOCIAL_INSIGHTS_METRICS_OWNER'
+if not os.getenv('PROMETHEUS_MULTIPROC_DIR') or os.getenv(_METRICS_OWNER, str(os.getpid())) != str(os.getpid()):
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix=f'social-insights-metrics-{os.getpid()}-')
+    os.environ[_METRICS_OWNER] = str(os.getpid())
+
+# Import the app once in the master and fork workers from it (also `--preload`).
+# Code and immutable module state are then shared copy-on-write; connection
+# pools are still created per worker (see post_fork).
+preload_app = os.getenv('GUNICORN_PRELOAD', 'false').lower() == 'true'
+
+
+def _owns_metrics_dir() -> bool:
+    return os.getenv(_METRICS_OWNER) == str(os.getpid())
+
+
+def on_starting(server):
+    # A configured directory is shared with whoever configured it: never wiped here
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+
+def on_exit(server):
+    if _owns_metrics_dir():
+        shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+
+
+def when_ready(server):
+    if not server.cfg.preload_app:
+        return
+    from app import warm
+    warm()
+    # Keep the collector from touching (and so copying) every inherited object
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        from app import after_fork
+        after_fork()
+
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)